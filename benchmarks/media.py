@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmark collecting ``BasePanelView.media`` for 5 to 200 panels.
+
+Compares chaining ``Media.__add__`` (the former implementation), merging the
+media in place and the cached media of ``BasePanelView``.
+
+    python benchmarks/media.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "panelviews.settings")
+
+import django  # noqa
+django.setup()
+
+from django.forms.widgets import Media  # noqa
+
+from panelviews.views import BasePanelView, Panel, collect_media  # noqa
+
+PANEL_COUNTS = (5, 10, 50, 100, 200)
+
+
+def make_view(count):
+    panels = {}
+    for index in range(count):
+        media = type('Media', (object, ), {
+            'js': ('bench/panel{}.js'.format(index), 'bench/shared.js'),
+            'css': {'all': ('bench/panel{}.css'.format(index), )},
+        })
+        panels['panel{}'.format(index)] = type(
+            str('BenchPanel{}'.format(index)),
+            (Panel, ),
+            {'Media': media, '__module__': __name__}
+        )
+    view_class = type(
+        str('BenchView{}'.format(count)),
+        (BasePanelView, ),
+        {'panels': panels, '__module__': __name__}
+    )
+    view = view_class()
+    view.panels = dict(
+        (name, panel_class(view, name))
+        for name, panel_class in panels.items()
+    )
+    return view
+
+
+def chained(view):
+    media = Media()
+    for panel in view.panels.values():
+        media = media + panel.media
+    return media.render()
+
+
+def merged(view):
+    return collect_media(panel.media for panel in view.panels.values()).render()
+
+
+def cached(view):
+    return view.media.render()
+
+
+def main():
+    print('{:>7} {:>14} {:>14} {:>14}'.format(
+        'panels', 'chained (ms)', 'merged (ms)', 'cached (ms)'
+    ))
+    for count in PANEL_COUNTS:
+        view = make_view(count)
+        number = max(2000 // count, 5)
+        timings = [
+            timeit.timeit(lambda: function(view), number=number) / number * 1000
+            for function in (chained, merged, cached)
+        ]
+        print('{:>7} {:>14.3f} {:>14.3f} {:>14.4f}'.format(count, *timings))
+
+
+if __name__ == '__main__':
+    main()
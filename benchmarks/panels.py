@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmark instantiating panels, e.g. for panels rendered per list row.
+
+Compares the former panel runtime, building its context dict and template
+name suffix in ``__init__`` and formatting ``get_url()`` on every call,
+with ``Panel``. Every instance is created and its url read three times, as
+a template loop does. Memory per instance is measured with tracemalloc
+(Python 3 only).
+
+    python benchmarks/panels.py
+"""
+import os
+import sys
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "panelviews.settings")
+
+import django  # noqa
+django.setup()
+
+from panelviews.views import BasePanelView, Panel, PANEL_IDENTIFIER  # noqa
+
+PANEL_COUNTS = (10, 100, 1000)
+
+
+class FormerPanel(Panel):
+    def __init__(self, view, name):
+        self.name = name
+        if not hasattr(self, 'template_name'):
+            self.template_name_suffix =\
+                self.template_name_suffix.format(self.name)
+        self.view = view
+        self.context = {'panel': self, 'view': self.view}
+
+    def get_url(self):
+        return u"{}?{}={}".format(
+            self.view.get_url(),
+            PANEL_IDENTIFIER,
+            self.name
+        )
+
+
+class BenchView(BasePanelView):
+    template_name = 'tests/dashboard.html'
+    url = '/bench/'
+
+
+def instantiate(panel_class, view, count):
+    panels = []
+    for index in range(count):
+        panel = panel_class(view, 'row{}'.format(index))
+        for _ in range(3):
+            panel.get_url()
+        panels.append(panel)
+    return panels
+
+
+def allocated_per_panel(panel_class, view, count):
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    panels = instantiate(panel_class, view, count)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del panels
+    return float(allocated) / count
+
+
+def main():
+    view = BenchView()
+    print('{:>7} {:>10} {:>14} {:>14} {:>12} {:>12}'.format(
+        'panels', '', 'time (ms)', 'per panel (us)', 'bytes/panel', 'saved'
+    ))
+    for count in PANEL_COUNTS:
+        number = max(20000 // count, 5)
+        former_bytes = None
+        for label, panel_class in (('former', FormerPanel), ('panel', Panel)):
+            duration = timeit.timeit(
+                lambda: instantiate(panel_class, view, count), number=number
+            ) / number
+            allocated = allocated_per_panel(panel_class, view, count)
+            saved = ''
+            if allocated is None:
+                allocated = 'n/a'
+            elif former_bytes is None:
+                former_bytes = allocated
+            else:
+                saved = '{:.0%}'.format(1 - allocated / former_bytes)
+            if not isinstance(allocated, str):
+                allocated = '{:.0f}'.format(allocated)
+            print('{:>7} {:>10} {:>14.3f} {:>14.3f} {:>12} {:>12}'.format(
+                count, label, duration * 1000, duration / count * 1e6,
+                allocated, saved
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmark suite for ``BasePanelView`` dispatch and panel rendering.
+
+Runs synthetic views with 1, 10, 50 and 200 panels through full-page
+renders, single panel Ajax requests, panel POSTs and media collection, and
+reports throughput, p50/p99 latency and allocated memory (Python 3 only).
+It uses the in-memory SQLite settings and needs no network.
+
+    python benchmarks/run.py                    # compare with the baseline
+    python benchmarks/run.py --save             # write a new baseline
+    python benchmarks/run.py --threshold 0.3    # allow 30% slower p50
+
+Exits with status 1 if a p50 latency or, on Python 3, the allocated memory
+regressed beyond the threshold. Every major Python version has its own
+baseline, ``baseline-py2.json`` and ``baseline-py3.json``. Baselines are
+only comparable on the same machine and interpreter.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "panelviews.settings")
+
+import django  # noqa
+django.setup()
+
+from django.conf import settings  # noqa
+from django.http import HttpResponse  # noqa
+from django.test import RequestFactory  # noqa
+
+from panelviews.views import BasePanelView, Panel, PANEL_IDENTIFIER  # noqa
+
+# Measure production behaviour, e.g. the compiled template registry.
+settings.DEBUG = False
+
+PANEL_COUNTS = (1, 10, 50, 200)
+ALLOCATION_RUNS = 5
+BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'baseline-py{}.json'.format(sys.version_info[0])
+)
+factory = RequestFactory()
+
+
+class BenchPanel(Panel):
+    template_name = 'tests/view1.html'
+
+    def get_context_data(self):
+        return {'additional_context': self.name}
+
+    def post(self, request, *args, **kwargs):
+        return HttpResponse(self.name)
+
+
+def make_view(count):
+    panels = {}
+    for index in range(count):
+        media = type('Media', (object, ), {
+            'js': ('bench/panel{}.js'.format(index), ),
+        })
+        panels['panel{}'.format(index)] = type(
+            str('BenchPanel{}'.format(index)),
+            (BenchPanel, ),
+            {'Media': media, '__module__': __name__}
+        )
+    return type(
+        str('BenchView{}'.format(count)),
+        (BasePanelView, ),
+        {
+            'template_name': 'tests/dashboard.html',
+            'panels': panels,
+            '__module__': __name__,
+        }
+    )
+
+
+def full_page(view_class, view):
+    view(factory.get('/bench/')).render()
+
+
+def single_panel(view_class, view):
+    view(factory.get(
+        '/bench/?{}=panel0'.format(PANEL_IDENTIFIER),
+        HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+    ))
+
+
+def panel_post(view_class, view):
+    view(factory.post(
+        '/bench/?{}=panel0'.format(PANEL_IDENTIFIER),
+        HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+    ))
+
+
+def media(view_class, view):
+    instance = view_class()
+    instance._setup_panels(factory.get('/bench/'))
+    instance.media.render()
+
+
+SCENARIOS = (
+    ('full_page', full_page),
+    ('single_panel', single_panel),
+    ('panel_post', panel_post),
+    ('media', media),
+)
+
+
+def measure(function, view_class, min_time, min_runs):
+    view = view_class.as_view()
+    for _ in range(3):
+        function(view_class, view)
+    latencies = []
+    started = default_timer()
+    while len(latencies) < min_runs or default_timer() - started < min_time:
+        start = default_timer()
+        function(view_class, view)
+        latencies.append((default_timer() - start) * 1000)
+    latencies.sort()
+    allocated = None
+    if tracemalloc is not None:
+        # Peak of the least allocating call, garbage collections and
+        # caches filled on the fly make single calls noisy.
+        peaks = []
+        for _ in range(ALLOCATION_RUNS):
+            gc.collect()
+            tracemalloc.start()
+            function(view_class, view)
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024.0)
+            tracemalloc.stop()
+        allocated = min(peaks)
+    return {
+        'runs': len(latencies),
+        'throughput': len(latencies) / (sum(latencies) / 1000),
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+        'allocated_kb': allocated,
+    }
+
+
+def run(min_time, min_runs):
+    results = {}
+    for count in PANEL_COUNTS:
+        view_class = make_view(count)
+        for name, function in SCENARIOS:
+            key = '{}/{}'.format(name, count)
+            results[key] = measure(function, view_class, min_time, min_runs)
+            report(key, results[key])
+    return results
+
+
+def report(key, result):
+    allocated = result['allocated_kb']
+    print('{:<18} {:>10.1f}/s  p50 {:>9.3f}ms  p99 {:>9.3f}ms  {:>10}'.format(
+        key, result['throughput'], result['p50'], result['p99'],
+        'n/a' if allocated is None else '{:.1f}KB'.format(allocated)
+    ))
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, result in sorted(results.items()):
+        if key not in baseline:
+            continue
+        change = result['p50'] / baseline[key]['p50'] - 1
+        marker = ''
+        if change > threshold:
+            marker = '  REGRESSION'
+            regressions.append(key)
+        print('{:<18} p50 {:>9.3f}ms -> {:>9.3f}ms  {:>+7.1%}{}'.format(
+            key, baseline[key]['p50'], result['p50'], change, marker
+        ))
+        allocated = result['allocated_kb']
+        baseline_allocated = baseline[key].get('allocated_kb', None)
+        if allocated is None or not baseline_allocated:
+            continue
+        change = allocated / baseline_allocated - 1
+        marker = ''
+        if change > threshold:
+            marker = '  REGRESSION'
+            regressions.append(u'{} (memory)'.format(key))
+        print('{:<18} mem {:>8.1f}KB -> {:>8.1f}KB  {:>+7.1%}{}'.format(
+            '', baseline_allocated, allocated, change, marker
+        ))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as new baseline')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed p50 slowdown and memory growth, '
+                             'default 0.2 (20%%)')
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help='seconds to run every benchmark')
+    parser.add_argument('--min-runs', type=int, default=20)
+    args = parser.parse_args()
+
+    print('Python {}, Django {}'.format(
+        platform.python_version(), django.get_version()
+    ))
+    results = run(args.min_time, args.min_runs)
+
+    if args.save:
+        with open(args.baseline, 'w') as baseline:
+            json.dump({
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'results': results,
+            }, baseline, indent=2, sort_keys=True, separators=(',', ': '))
+        print('Saved baseline to {}'.format(args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        print('No baseline at {}, run with --save'.format(args.baseline))
+        return 0
+    with open(args.baseline) as baseline:
+        baseline = json.load(baseline)
+    print('\nCompared with baseline (Python {python}, Django {django}):'.format(
+        **baseline
+    ))
+    regressions = compare(results, baseline['results'], args.threshold)
+    if regressions:
+        print('\n{} regression(s): {}'.format(
+            len(regressions), ', '.join(regressions)
+        ))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+# coding: utf-8
+"""
+In-process channel announcing changed panels to open event streams.
+
+Every label, the ``cache_label()`` of a panel class, has a version counting
+its changes. Event streams wait for the versions of their panels to change.
+The channel works within one process; deployments with several processes
+need a channel with the same interface backed by a broker.
+"""
+import threading
+import time
+
+
+class PanelChannel(object):
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._versions = {}
+
+    def publish(self, label):
+        """
+        Announce that the panels of ``label`` changed.
+        """
+        with self._condition:
+            self._versions[label] = self._versions.get(label, 0) + 1
+            self._condition.notify_all()
+
+    def versions(self, labels):
+        with self._condition:
+            return dict(
+                (label, self._versions.get(label, 0)) for label in labels
+            )
+
+    def wait(self, versions, timeout):
+        """
+        Wait up to ``timeout`` seconds for a label of ``versions`` to change.
+
+        ``versions`` maps labels to the versions seen last. Returns the
+        current versions of these labels.
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            while True:
+                current = dict(
+                    (label, self._versions.get(label, 0))
+                    for label in versions
+                )
+                remaining = deadline - time.time()
+                if current != versions or remaining <= 0:
+                    return current
+                self._condition.wait(remaining)
+
+
+panel_channel = PanelChannel()
@@ -0,0 +1,62 @@
+# coding: utf-8
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from panelviews.warmup import warm_panel_views
+
+
+class Command(BaseCommand):
+    help = (
+        'Compile the panel templates and collect the media of all panel '
+        'views of the URLconf, optionally render their cacheable panels.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--render', action='store_true',
+            help='render the panels with cache_timeout into the cache',
+        )
+        parser.add_argument(
+            '--user', action='append', dest='users', default=[],
+            help='username to render the panels for, repeatable '
+                 '(default: anonymous)',
+        )
+        parser.add_argument('--urlconf', default=None)
+
+    def handle(self, *args, **options):
+        users = [None]
+        if options['users']:
+            user_model = get_user_model()
+            try:
+                users = [
+                    user_model._default_manager.get_by_natural_key(username)
+                    for username in options['users']
+                ]
+            except user_model.DoesNotExist as error:
+                raise CommandError(error)
+
+        results = warm_panel_views(
+            options['urlconf'], render=options['render'], users=users
+        )
+        self.stdout.write(u'{:<50} {:>9} {:>11} {:>8} {:>11}'.format(
+            'view', 'templates', 'media (ms)', 'panels', 'render (ms)'
+        ))
+        total = 0
+        for result in results:
+            view = result.found_view
+            label = u'{}.{}'.format(
+                view.view_class.__module__, view.view_class.__name__
+            )
+            timings = result.timings
+            render = timings.get('render', None)
+            self.stdout.write(
+                u'{:<50} {:>9} {:>11.1f} {:>8} {:>11}'.format(
+                    label[-50:], len(result.templates), timings['media'],
+                    len(result.rendered),
+                    '-' if render is None else '{:.1f}'.format(render),
+                )
+            )
+            total += sum(timings.values())
+        self.stdout.write(u'Warmed {} panel views in {:.1f}ms'.format(
+            len(results), total
+        ))
@@ -0,0 +1,92 @@
+# coding: utf-8
+
+import socket
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+
+class MetricsSink(object):
+    """
+    Receives panel timings. Subclasses send them to a metrics backend.
+    """
+
+    def timing(self, name, milliseconds):
+        raise NotImplementedError  # pragma: no cover
+
+    def incr(self, name, count=1):
+        raise NotImplementedError  # pragma: no cover
+
+
+class StatsdMetricsSink(MetricsSink):
+    """
+    Sends metrics to a statsd server via UDP.
+    """
+
+    def __init__(self, host='localhost', port=8125, prefix='panelviews'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, name, value, kind):
+        data = u'{}.{}:{}|{}'.format(self.prefix, name, value, kind)
+        try:
+            self.socket.sendto(data.encode('utf-8'), self.address)
+        except socket.error:
+            # Metrics must never break a request.
+            pass
+
+    def timing(self, name, milliseconds):
+        self.send(name, u'{:.3f}'.format(milliseconds), 'ms')
+
+    def incr(self, name, count=1):
+        self.send(name, count, 'c')
+
+
+class LocalMetricsSink(MetricsSink):
+    """
+    Keeps metrics in memory, e.g. for tests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def timing(self, name, milliseconds):
+        with self._lock:
+            self.timings.setdefault(name, []).append(milliseconds)
+
+    def incr(self, name, count=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def reset(self):
+        self.timings = {}
+        self.counters = {}
+
+
+_sink = []
+
+
+def get_metrics_sink():
+    """
+    Return the sink configured by ``PANELVIEWS_METRICS_SINK`` or ``None``.
+
+    The sink is created once with ``PANELVIEWS_METRICS_SINK_OPTIONS`` as
+    keyword arguments.
+    """
+    if not _sink:
+        path = getattr(settings, 'PANELVIEWS_METRICS_SINK', None)
+        options = getattr(settings, 'PANELVIEWS_METRICS_SINK_OPTIONS', {})
+        _sink.append(import_string(path)(**options) if path else None)
+    return _sink[0]
+
+
+def _sink_setting_changed(setting, **kwargs):
+    if setting.startswith('PANELVIEWS_METRICS_SINK'):
+        del _sink[:]
+
+
+setting_changed.connect(_sink_setting_changed)
@@ -0,0 +1,121 @@
+# coding: utf-8
+"""
+Data shared by the panels of a view.
+
+A view declares providers, functions loading data for a request::
+
+    @provider('contracts')
+    def load_shifts(view, request, contracts):
+        return Shift.objects.filter(contract__in=contracts)
+
+    class DashboardView(BasePanelView):
+        data_providers = {
+            'contracts': load_contracts,
+            'shifts': load_shifts,
+        }
+
+Panels list the data they need in ``requires_data`` and read it from
+``self.data``. Every provider runs at most once per request, after the
+providers it depends on.
+"""
+
+
+def provider(*requires):
+    """
+    Declare the names of the providers a provider function depends on.
+
+    Their data is passed to the function as keyword arguments.
+    """
+    def decorator(function):
+        function.requires = requires
+        return function
+    return decorator
+
+
+def get_requires(function):
+    return tuple(getattr(function, 'requires', ()))
+
+
+def validate_providers(providers):
+    """
+    Raise ``ValueError`` for unknown dependencies or dependency cycles.
+    """
+    resolve_levels(providers, providers.keys())
+
+
+def resolve_levels(providers, names):
+    """
+    Return ``names`` and their dependencies grouped in levels.
+
+    Providers of a level only depend on providers of earlier levels, so
+    the providers of one level can be loaded concurrently.
+    """
+    depth = {}
+
+    def visit(name, path):
+        if name in depth:
+            return depth[name]
+        if name in path:
+            raise ValueError(u'data providers have a cycle: {}'.format(
+                u' -> '.join(path + (name, ))
+            ))
+        if name not in providers:
+            raise ValueError(u'unknown data provider {!r}'.format(name))
+        depth[name] = 1 + max([
+            visit(dependency, path + (name, ))
+            for dependency in get_requires(providers[name])
+        ] or [-1])
+        return depth[name]
+
+    for name in names:
+        visit(name, ())
+    levels = [[] for _ in range(max(depth.values()) + 1 if depth else 0)]
+    for name in sorted(depth):
+        levels[depth[name]].append(name)
+    return levels
+
+
+class ProvidedData(object):
+    """
+    Data of the providers of a view, each loaded at most once per request.
+
+    Accessing a name loads it on demand. ``load()`` loads several names
+    ahead, independent providers concurrently.
+    """
+
+    def __init__(self, view, request, providers):
+        self.view = view
+        self.request = request
+        self.providers = providers
+        self._values = {}
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            self.load([name])
+        return self._values[name]
+
+    def __contains__(self, name):
+        return name in self.providers
+
+    def is_loaded(self, name):
+        return name in self._values
+
+    def _call(self, name):
+        function = self.providers[name]
+        dependencies = dict(
+            (dependency, self._values[dependency])
+            for dependency in get_requires(function)
+        )
+        return function(self.view, self.request, **dependencies)
+
+    def load(self, names, max_workers=1):
+        from panelviews.views import gather
+
+        for level in resolve_levels(self.providers, names):
+            level = [name for name in level if name not in self._values]
+            calls = [lambda name=name: self._call(name) for name in level]
+            if max_workers > 1 and len(calls) > 1:
+                results = gather(calls, max_workers)
+            else:
+                results = [call() for call in calls]
+            self._values.update(zip(level, results))
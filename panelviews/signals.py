@@ -0,0 +1,9 @@
+# coding: utf-8
+
+from django.dispatch import Signal
+
+
+# Sent once per panel after an instrumented view produced its response.
+# ``timings`` maps the phases is_available, set_up, get_context_data and
+# render to milliseconds, ``queries`` is the number of database queries.
+panel_timed = Signal(providing_args=['view', 'panel', 'timings', 'queries'])
@@ -0,0 +1,141 @@
+/*
+ * Loads deferred panels rendered as placeholders by BasePanelView.
+ *
+ *   data-panel-url       url of the panel (?panel=<name>)
+ *   data-load-strategy   "visible": load when scrolled into view
+ *                        "idle": load when the browser is idle
+ *
+ * Keeps panels current from the event stream of the view.
+ *
+ *   data-panel-events-url  url of the stream (view.get_events_url)
+ *   data-panel             name of the panel whose content the element shows
+ *
+ * Loads the next rows of paginated panels when scrolled into view.
+ *
+ *   data-panel-next-url    url of the next rows (panel next_page_url),
+ *                          replaced by the rows which may end with the next
+ *                          element of this kind
+ */
+(function (window, document) {
+  'use strict';
+
+  function load(placeholder) {
+    var request = new XMLHttpRequest();
+    request.open('GET', placeholder.getAttribute('data-panel-url'));
+    request.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
+    request.onload = function () {
+      if (request.status !== 200 || !placeholder.parentNode) {
+        return;
+      }
+      var container = document.createElement('div');
+      container.innerHTML = request.responseText;
+      while (container.firstChild) {
+        placeholder.parentNode.insertBefore(container.firstChild, placeholder);
+      }
+      placeholder.parentNode.removeChild(placeholder);
+    };
+    request.send();
+  }
+
+  function loadNextRows(sentinel) {
+    var request = new XMLHttpRequest();
+    request.open('GET', sentinel.getAttribute('data-panel-next-url'));
+    request.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
+    request.onload = function () {
+      if (request.status !== 200 || !sentinel.parentNode) {
+        return;
+      }
+      // Parsed in the context of the sentinel, so table rows stay rows.
+      var range = document.createRange();
+      range.selectNode(sentinel);
+      var rows = range.createContextualFragment(request.responseText);
+      var parent = sentinel.parentNode;
+      parent.replaceChild(rows, sentinel);
+      observeNextRows(parent);
+    };
+    request.send();
+  }
+
+  function whenIdle(placeholder) {
+    if (window.requestIdleCallback) {
+      window.requestIdleCallback(function () { load(placeholder); });
+    } else {
+      window.setTimeout(function () { load(placeholder); }, 200);
+    }
+  }
+
+  var observer = null;
+  if (window.IntersectionObserver) {
+    observer = new window.IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          load(entry.target);
+        }
+      });
+    }, {rootMargin: '200px'});
+  }
+
+  function listen(element) {
+    if (!window.EventSource) {
+      return;
+    }
+    var source = new window.EventSource(
+      element.getAttribute('data-panel-events-url')
+    );
+    source.addEventListener('panel', function (event) {
+      var data = JSON.parse(event.data);
+      var targets = document.querySelectorAll(
+        '[data-panel="' + data.name + '"]'
+      );
+      Array.prototype.forEach.call(targets, function (target) {
+        target.innerHTML = data.content;
+      });
+    });
+  }
+
+  var rowsObserver = null;
+  if (window.IntersectionObserver) {
+    rowsObserver = new window.IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          rowsObserver.unobserve(entry.target);
+          loadNextRows(entry.target);
+        }
+      });
+    }, {rootMargin: '200px'});
+  }
+
+  function observeNextRows(root) {
+    if (!rowsObserver) {
+      return;
+    }
+    var sentinels = root.querySelectorAll('[data-panel-next-url]');
+    Array.prototype.forEach.call(sentinels, function (sentinel) {
+      rowsObserver.observe(sentinel);
+    });
+  }
+
+  function init() {
+    var placeholders = document.querySelectorAll('[data-panel-url]');
+    Array.prototype.forEach.call(placeholders, function (placeholder) {
+      var strategy = placeholder.getAttribute('data-load-strategy');
+      if (strategy === 'visible' && observer) {
+        observer.observe(placeholder);
+      } else if (strategy === 'idle') {
+        whenIdle(placeholder);
+      } else {
+        load(placeholder);
+      }
+    });
+    var streams = document.querySelectorAll('[data-panel-events-url]');
+    Array.prototype.forEach.call(streams, listen);
+    observeNextRows(document);
+  }
+
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', init);
+  } else {
+    init();
+  }
+})(window, document);
@@ -1,14 +1,48 @@
 # coding: utf-8
 
 # import os
+import datetime
+import gzip
+import json
+import six
+import unittest
+import threading
+import time
+from collections import OrderedDict
+
 from django.test import LiveServerTestCase
+from django.test import SimpleTestCase
+from django.test import TestCase
 from django.test import Client
+from django.test import RequestFactory
+from django.test import override_settings
 from django import forms
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.exceptions import SuspiciousOperation
+from django.db import connection
 from django.http import JsonResponse
 
+from panelviews.views import AsyncPanelView
 from panelviews.views import BasePanelView
+from panelviews.views import CircuitBreaker
 from panelviews.views import Panel
+from panelviews.views import PanelCollection
 from panelviews.views import PANEL_IDENTIFIER
+from panelviews.views import EVENTS_IDENTIFIER
+from panelviews.views import panel_cache_stats
+from panelviews.views import clear_template_cache
+from panelviews.views import minify_html
+from panelviews.views import single_flight
+from panelviews import views
+from panelviews.metrics import get_metrics_sink
+from panelviews.providers import provider
+from panelviews.signals import panel_timed
+from panelviews.warmup import FoundView
+from panelviews.warmup import find_panel_views
+from panelviews.warmup import warm_panels
 
 
 class NameForm(forms.Form):
@@ -76,33 +110,614 @@ class NotPanelClass2(object):
         pass
 
 
-class ErrorPage(BasePanelView):
+def define_page(panels):
+    return type('ErrorPage', (BasePanelView, ), {
+        'template_name': "tests/dashboard.html",
+        'panels': panels,
+    })
+
+
+class LoginDashboardPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+
+
+class NotLoggedIPage(BasePanelView):
+    template_name = "tests/not-logged-in.html"
+
+
+SET_UP_CALLS = []
+
+
+class CountingPanel(Panel):
+    template_name = 'tests/view1.html'
+
+    def set_up(self, request):
+        super(CountingPanel, self).set_up(request)
+        SET_UP_CALLS.append(self.name)
+
+
+class UnavailablePanel(CountingPanel):
+    def is_available(self, view, request):
+        return False
+
+
+class CountingPage(BasePanelView):
     template_name = "tests/dashboard.html"
     panels = {
-        12313: DashboardView1,
+        'panel1': CountingPanel,
+        'panel2': CountingPanel,
+        'panel3': CountingPanel,
+        'hidden': UnavailablePanel,
     }
 
 
-class ErrorPage2(BasePanelView):
+class LazyPanel(CountingPanel):
+    lazy = True
+
+
+class IdlePanel(CountingPanel):
+    load_strategy = 'idle'
+
+
+class DeferredPage(BasePanelView):
     template_name = "tests/dashboard.html"
     panels = {
-        'identifier': NotPanelClass1,
+        'panel1': CountingPanel,
+        'lazy': LazyPanel,
+        'idle': IdlePanel,
     }
 
 
-class ErrorPage3(BasePanelView):
+class EagerCountingPage(CountingPage):
+    lazy_panel_dispatch = False
+
+
+class SlowPanel(Panel):
+    template_name = 'tests/view1.html'
+    delay = 0.3
+
+    def get_context_data(self):
+        time.sleep(self.delay)
+        return {
+            'additional_context': threading.current_thread().name
+        }
+
+
+class FastPanel(SlowPanel):
+    delay = 0
+
+
+class VerySlowPanel(SlowPanel):
+    delay = 1
+
+    def timeout_content(self):
+        return u'timed out'
+
+
+class BrokenPanel(Panel):
+    def get_context_data(self):
+        raise RuntimeError('broken panel')
+
+
+class ConcurrentPage(BasePanelView):
     template_name = "tests/dashboard.html"
+    render_panels_concurrently = True
+    panels = {
+        'panel1': SlowPanel,
+        'panel2': SlowPanel,
+        'panel3': SlowPanel,
+    }
+
+
+class SequentialPage(ConcurrentPage):
+    render_panels_concurrently = False
+    panels = {
+        'panel1': FastPanel,
+        'panel2': FastPanel,
+    }
+
+
+class TimeoutPage(ConcurrentPage):
+    panel_render_timeout = 0.5
+    panels = {
+        'panel1': SlowPanel,
+        'panel2': VerySlowPanel,
+    }
+
+
+class BrokenConcurrentPage(ConcurrentPage):
+    panels = {
+        'panel1': SlowPanel,
+        'panel2': BrokenPanel,
+    }
+
+
+CONTEXT_CALLS = []
+
+
+class CachedPanel(Panel):
+    template_name = 'tests/view1.html'
+    cache_timeout = 60
+
+    def get_context_data(self):
+        CONTEXT_CALLS.append(self.name)
+        return {'additional_context': len(CONTEXT_CALLS)}
+
+
+class UserCachedPanel(CachedPanel):
+    cache_vary_on_user = True
+
+
+class ParamCachedPanel(CachedPanel):
+    cache_vary_on_params = ('page', )
+
+
+class CachedPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    panels = {
+        'cached': CachedPanel,
+        'user': UserCachedPanel,
+        'param': ParamCachedPanel,
+    }
+
+
+class RecordingPanel(FastPanel):
+    def get_context_data(self):
+        CONTEXT_CALLS.append(self.name)
+        return super(RecordingPanel, self).get_context_data()
+
+
+class EagerConcurrentPage(ConcurrentPage):
+    lazy_panel_dispatch = False
     panels = {
-        'identifier': NotPanelClass2,
+        'panel1': RecordingPanel,
+        'panel2': RecordingPanel,
+        'panel3': RecordingPanel,
     }
 
 
-class LoginDashboardPage(BasePanelView):
+class MediaPanel(Panel):
+    template_name = 'tests/view1.html'
+
+    class Media:
+        js = ('panelviews/js/test.js', 'panelviews/js/bootstrap.min.js')
+
+
+class UncachedMediaPage(DashboardPage):
+    cache_media = False
+
+
+class StreamingPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    stream_panels = True
+    panels = {
+        'panel1': CachedPanel,
+        'panel2': DashboardView2,
+        'media': MediaPanel,
+    }
+
+
+class ConcurrentStreamingPage(StreamingPage):
+    render_panels_concurrently = True
+    panels = {
+        'slow': SlowPanel,
+        'fast': FastPanel,
+    }
+
+
+class VersionedPanel(CachedPanel):
+    version = 1
+    cache_timeout = None
+
+    def get_etag(self):
+        return VersionedPanel.version
+
+
+class ModifiedPanel(CachedPanel):
+    cache_timeout = None
+
+    def get_last_modified(self):
+        return 1444000000
+
+
+class ConditionalPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    panels = {
+        'versioned': VersionedPanel,
+        'modified': ModifiedPanel,
+    }
+
+
+class VersionedPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    panels = {
+        'panel1': VersionedPanel,
+        'panel2': VersionedPanel,
+    }
+
+
+class LazyUserPanel(VersionedPanel):
+    lazy = True
+
+    def get_etag(self):
+        return self.request.user.pk
+
+
+class LazyVersionedPage(VersionedPage):
+    panels = {
+        'panel1': VersionedPanel,
+        'lazy': LazyUserPanel,
+    }
+
+
+class QueryPanel(Panel):
+    template_name = 'tests/view1.html'
+    serve_data = True
+
+    def get_context_data(self):
+        cursor = connection.cursor()
+        cursor.execute('SELECT 1')
+        return {'additional_context': cursor.fetchone()[0]}
+
+
+class InstrumentedPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    instrument_panels = True
+    panels = {
+        'query': QueryPanel,
+        'panel2': DashboardView2,
+        'hidden': UnavailablePanel,
+    }
+
+
+class SlowSetUpPanel(SlowPanel):
+    delay = 0
+
+    def set_up(self, request):
+        super(SlowSetUpPanel, self).set_up(request)
+        time.sleep(0.3)
+
+
+class AwaitingPanel(Panel):
+    template_name = 'tests/view1.html'
+
+    def set_up(self, request):
+        super(AwaitingPanel, self).set_up(request)
+        return views.asyncio.sleep(0.3)
+
+    def get_context_data(self):
+        return views.asyncio.sleep(
+            0.3, result={'additional_context': 'awaited context'}
+        )
+
+
+class AsyncPage(AsyncPanelView):
+    template_name = "tests/dashboard.html"
+    panels = {
+        'panel1': SlowSetUpPanel,
+        'panel2': SlowSetUpPanel,
+        'panel3': SlowPanel,
+    }
+
+
+class AwaitingPage(AsyncPanelView):
+    template_name = "tests/dashboard.html"
+    panels = {
+        'panel1': AwaitingPanel,
+        'panel2': AwaitingPanel,
+        'panel3': SlowPanel,
+    }
+
+
+class AsyncTimeoutPage(AsyncPanelView):
+    template_name = "tests/dashboard.html"
+    panel_render_timeout = 0.5
+    panels = {
+        'panel1': SlowPanel,
+        'panel2': VerySlowPanel,
+    }
+
+
+PROVIDER_CALLS = []
+
+
+def load_contracts(view, request):
+    PROVIDER_CALLS.append('contracts')
+    return ['contract1', 'contract2']
+
+
+@provider('contracts')
+def load_shifts(view, request, contracts):
+    PROVIDER_CALLS.append('shifts')
+    return [u'{} shift'.format(contract) for contract in contracts]
+
+
+def load_slowly(view, request):
+    time.sleep(0.3)
+    PROVIDER_CALLS.append('slow')
+    return 'slow'
+
+
+class ContractsPanel(Panel):
+    template_name = 'tests/view1.html'
+    requires_data = ('contracts', )
+
+    def get_context_data(self):
+        return {'additional_context': u', '.join(self.data['contracts'])}
+
+
+class ShiftsPanel(Panel):
+    template_name = 'tests/view1.html'
+    requires_data = ('shifts', )
+
+    def get_context_data(self):
+        return {'additional_context': u', '.join(self.data['shifts'])}
+
+
+class SlowDataPanel(Panel):
+    template_name = 'tests/view1.html'
+    requires_data = ('slow1', 'slow2')
+
+
+class ProviderPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    data_providers = {
+        'contracts': load_contracts,
+        'shifts': load_shifts,
+        'unused': load_slowly,
+    }
+    panels = {
+        'panel1': ContractsPanel,
+        'panel2': ContractsPanel,
+        'panel3': ShiftsPanel,
+    }
+
+
+class ConcurrentProviderPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    load_data_concurrently = True
+    data_providers = {
+        'slow1': load_slowly,
+        'slow2': load_slowly,
+    }
+    panels = {
+        'panel1': SlowDataPanel,
+    }
+
+
+PANEL_VERSION = [1]
+
+
+class NotifiedPanel(Panel):
+    template_name = 'tests/view1.html'
+
+
+class VersionedEventPanel(Panel):
+    template_name = 'tests/view1.html'
+
+    def get_version(self):
+        return PANEL_VERSION[0]
+
+
+class CachedEventPanel(VersionedEventPanel):
+    cache_timeout = 60
+
+    def get_context_data(self):
+        return {'additional_context': u'state={}'.format(PANEL_VERSION[0])}
+
+
+def load_state(view, request):
+    return PANEL_VERSION[0]
+
+
+class StateEventPanel(VersionedEventPanel):
+    requires_data = ('state', )
+
+    def get_context_data(self):
+        return {'additional_context': u'state={}'.format(self.data['state'])}
+
+
+class RefreshedPanel(Panel):
+    template_name = 'tests/view1.html'
+    refresh_interval = 0.2
+
+
+class EventsPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    events_poll_interval = 0.05
+    events_max_duration = 0.5
+    data_providers = {
+        'state': load_state,
+    }
+    panels = {
+        'notified': NotifiedPanel,
+        'versioned': VersionedEventPanel,
+        'refreshed': RefreshedPanel,
+        'cached': CachedEventPanel,
+        'state': StateEventPanel,
+    }
+
+
+class DataPanel(Panel):
+    # Never rendered in data mode.
+    template_name = 'tests/missing.html'
+    serve_data = True
+
+    def get_context_data(self):
+        return super(DataPanel, self).get_context_data(
+            day=datetime.date(2016, 1, 2), count=3
+        )
+
+
+class DataPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    panels = {
+        'data': DataPanel,
+    }
+
+
+PROCESSOR_CALLS = []
+
+
+def counting_processor(request):
+    PROCESSOR_CALLS.append(request.path)
+    return {'processed': u'processed context'}
+
+
+class ProcessedPanel(Panel):
+    template_name = 'tests/processed.html'
+
+
+class OwnProcessorsPanel(ProcessedPanel):
+    context_processors = ('panelviews.tests.counting_processor', )
+
+
+class ProcessedPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    panels = {
+        'panel1': ProcessedPanel,
+        'panel2': ProcessedPanel,
+        'panel3': ProcessedPanel,
+    }
+
+
+def counting_templates():
+    templates = [dict(settings.TEMPLATES[0])]
+    templates[0]['OPTIONS'] = {'context_processors': (
+        settings.TEMPLATES[0]['OPTIONS']['context_processors']
+        + ['panelviews.tests.counting_processor']
+    )}
+    return templates
+
+
+RENDER_ORDER = []
+
+
+class PrioritizedPanel(FastPanel):
+    def get_context_data(self):
+        RENDER_ORDER.append(self.name)
+        return super(PrioritizedPanel, self).get_context_data()
+
+
+class ImportantPanel(PrioritizedPanel):
+    priority = 10
+
+
+class LazyFallbackPanel(SlowPanel):
+    render_timeout = 0.1
+    fallback = 'lazy'
+
+
+class PrioritizedPage(ConcurrentPage):
+    max_render_workers = 1
+    panels = OrderedDict([
+        ('panel1', PrioritizedPanel),
+        ('panel2', ImportantPanel),
+        ('panel3', PrioritizedPanel),
+    ])
+
+
+class DegradedPage(ConcurrentPage):
+    panels = {
+        'panel1': FastPanel,
+        'panel2': LazyFallbackPanel,
+    }
+
+
+FAILURES = []
+
+
+class FailingPanel(Panel):
+    template_name = 'tests/view1.html'
+    circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    def get_context_data(self):
+        FAILURES.append(self.name)
+        raise RuntimeError('failing panel')
+
+
+class HangingPanel(Panel):
+    template_name = 'tests/view1.html'
+    circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    def get_context_data(self):
+        FAILURES.append(self.name)
+        time.sleep(0.3)
+        return {}
+
+
+class HangingPage(ConcurrentPage):
+    panel_render_timeout = 0.05
+    panels = {
+        'hanging': HangingPanel,
+    }
+
+
+class AsyncFailingPage(AsyncPanelView):
+    template_name = "tests/dashboard.html"
+    panels = {
+        'panel1': FastPanel,
+        'failing': FailingPanel,
+    }
+
+
+class TablePanel(VersionedPanel):
+    template_name = 'tests/table.html'
+    minify = True
+    precompress = True
+
+    def get_context_data(self):
+        return {'rows': range(20)}
+
+
+class TablePage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    panels = {
+        'table': TablePanel,
+    }
+
+
+class UsersPanel(Panel):
+    template_name = 'tests/users.html'
+    rows_template_name = 'tests/user_rows.html'
+    paginate_by = 2
+    cursor_field = '-username'
+
+    def get_queryset(self):
+        return User.objects.all()
+
+
+class UserValuesPanel(UsersPanel):
+    cursor_field = 'pk'
+    serve_data = True
+
+    def get_queryset(self):
+        return User.objects.values('pk', 'username')
+
+
+class UsersPage(BasePanelView):
+    template_name = "tests/dashboard.html"
+    panels = {
+        'users': UsersPanel,
+        'values': UserValuesPanel,
+    }
+
+
+class CoalescedPanel(CachedPanel):
+    coalesce_renders = True
+    cache_lock_timeout = 5
+    stale_timeout = 60
+
+    def get_context_data(self):
+        time.sleep(0.2)
+        return super(CoalescedPanel, self).get_context_data()
+
+
+class CoalescedPage(BasePanelView):
     template_name = "tests/dashboard.html"
-
-
-class NotLoggedIPage(BasePanelView):
-    template_name = "tests/not-logged-in.html"
+    panels = {
+        'coalesced': CoalescedPanel,
+    }
 
 
 class PageViewTestCase(LiveServerTestCase):
@@ -124,10 +739,10 @@ class PageViewTestCase(LiveServerTestCase):
         )
 
     def test_panel_name_validation(self):
-        self.assertRaises(ValueError, ErrorPage)
+        self.assertRaises(ValueError, define_page, {12313: DashboardView1})
 
-        self.assertRaises(ValueError, ErrorPage2().get, 'afawf')
-        self.assertRaises(ValueError, ErrorPage3().get, 'awfwf')
+        self.assertRaises(ValueError, define_page, {'identifier': NotPanelClass1})
+        self.assertRaises(ValueError, define_page, {'identifier': NotPanelClass2})
 
         try:
             DashboardPage()
@@ -237,3 +852,1119 @@ class PageViewTestCase(LiveServerTestCase):
         self.assertTrue("panel1: " in direct_rendered)
         direct_rendered = self.page.content.split('*****')[1]
         self.assertTrue(direct_rendered == '')
+
+
+class LazyPanelDispatchTestCase(SimpleTestCase):
+    def setUp(self):
+        del SET_UP_CALLS[:]
+        self.factory = RequestFactory()
+
+    def panel_request(self, method, name):
+        return getattr(self.factory, method)(
+            '/counting/?{}={}'.format(PANEL_IDENTIFIER, name),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+    def test_panel_get_sets_up_requested_panel_only(self):
+        resp = CountingPage.as_view()(self.panel_request('get', 'panel2'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue('panel2' in resp.content)
+        self.assertEqual(SET_UP_CALLS, ['panel2'])
+
+    def test_panel_post_sets_up_requested_panel_only(self):
+        self.assertRaises(
+            NotImplementedError,
+            CountingPage.as_view(), self.panel_request('post', 'panel3')
+        )
+        self.assertEqual(SET_UP_CALLS, ['panel3'])
+
+    def test_page_sets_up_all_available_panels(self):
+        resp = CountingPage.as_view()(self.factory.get('/counting/'))
+        resp.render()
+        self.assertEqual(sorted(SET_UP_CALLS), ['panel1', 'panel2', 'panel3'])
+
+    def test_unavailable_panel_falls_back_to_page(self):
+        resp = CountingPage.as_view()(self.panel_request('get', 'hidden'))
+        resp.render()
+        self.assertTrue('dashboard' in resp.content)
+        self.assertEqual(sorted(SET_UP_CALLS), ['panel1', 'panel2', 'panel3'])
+
+    def test_unknown_panel_post_bad_request(self):
+        resp = CountingPage.as_view()(self.panel_request('post', 'unknown'))
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(SET_UP_CALLS, [])
+
+    def test_eager_dispatch_sets_up_all_panels(self):
+        resp = EagerCountingPage.as_view()(self.panel_request('get', 'panel2'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(sorted(SET_UP_CALLS), ['panel1', 'panel2', 'panel3'])
+
+
+class ConcurrentRenderingTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def render_page(self, view_class):
+        view = view_class()
+        resp = view.dispatch(self.factory.get('/concurrent/'))
+        resp.render()
+        return view, resp
+
+    def test_panels_rendered_concurrently(self):
+        start = time.time()
+        view, resp = self.render_page(ConcurrentPage)
+        self.assertTrue(time.time() - start < 0.75)
+        main_thread = threading.current_thread().name
+        for panel in view.panels.values():
+            self.assertTrue(panel.prerendered_content)
+            self.assertFalse(main_thread in panel.prerendered_content)
+        self.assertTrue('panel3' in resp.content)
+
+    def test_panel_timeout(self):
+        start = time.time()
+        view, resp = self.render_page(TimeoutPage)
+        self.assertTrue(time.time() - start < 0.9)
+        self.assertEqual(view.panels['panel2'].prerendered_content, u'timed out')
+        self.assertTrue('timed out' in resp.content)
+        self.assertTrue('panel1' in resp.content)
+
+    def test_late_render_keeps_fallback(self):
+        view, resp = self.render_page(TimeoutPage)
+        # Wait for the timed out render to finish on its worker.
+        time.sleep(0.7)
+        self.assertEqual(view.panels['panel2'].prerendered_content, u'timed out')
+        self.assertEqual(view.panels['panel2'].content(), u'timed out')
+
+    def test_panel_error_reraised(self):
+        self.assertRaises(RuntimeError, self.render_page, BrokenConcurrentPage)
+
+    def test_disabled_by_default(self):
+        self.assertFalse(BasePanelView.render_panels_concurrently)
+        view, resp = self.render_page(SequentialPage)
+        main_thread = threading.current_thread().name
+        for panel in view.panels.values():
+            self.assertTrue(main_thread in panel.content())
+
+
+class FakeUser(object):
+    def __init__(self, pk):
+        self.pk = pk
+
+
+class PanelCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        panel_cache_stats.reset()
+        del CONTEXT_CALLS[:]
+        self.factory = RequestFactory()
+
+    def get_panel(self, name, query='', user=None, path='/cached/'):
+        request = self.factory.get(
+            '{}?{}={}{}'.format(path, PANEL_IDENTIFIER, name, query),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        request.user = user
+        return CachedPage.as_view()(request).content
+
+    def test_content_cached(self):
+        first = self.get_panel('cached')
+        self.assertEqual(first, self.get_panel('cached'))
+        self.assertEqual(CONTEXT_CALLS, ['cached'])
+        self.assertEqual(
+            panel_cache_stats.get(CachedPanel.cache_label()),
+            {'hits': 1, 'misses': 1}
+        )
+
+    def test_vary_on_user(self):
+        self.get_panel('user', user=FakeUser(1))
+        self.get_panel('user', user=FakeUser(1))
+        self.get_panel('user', user=FakeUser(2))
+        self.assertEqual(len(CONTEXT_CALLS), 2)
+
+    def test_vary_on_params(self):
+        self.get_panel('param', '&page=1')
+        self.get_panel('param', '&page=1&other=1')
+        self.get_panel('param', '&page=2')
+        self.assertEqual(len(CONTEXT_CALLS), 2)
+
+    def test_vary_on_path(self):
+        self.get_panel('cached', path='/company/1/cached/')
+        self.get_panel('cached', path='/company/1/cached/')
+        self.get_panel('cached', path='/company/2/cached/')
+        self.assertEqual(len(CONTEXT_CALLS), 2)
+
+    def test_invalidate_cache(self):
+        self.get_panel('cached')
+        CachedPanel.invalidate_cache()
+        self.get_panel('cached')
+        self.assertEqual(len(CONTEXT_CALLS), 2)
+        # Subclasses have their own generation.
+        self.get_panel('user')
+        UserCachedPanel.invalidate_cache()
+        self.get_panel('cached')
+        self.assertEqual(len(CONTEXT_CALLS), 3)
+
+    def test_delete_cached_content(self):
+        view = CachedPage()
+        view.dispatch(self.factory.get('/cached/')).render()
+        view.panels['cached'].delete_cached_content()
+        self.get_panel('cached')
+        self.get_panel('param')
+        self.assertEqual(CONTEXT_CALLS.count('cached'), 2)
+        self.assertEqual(CONTEXT_CALLS.count('param'), 1)
+
+
+class TemplateCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        clear_template_cache()
+        self.loaded = []
+        self.get_template = views.loader.get_template
+
+        def get_template(template_name, *args, **kwargs):
+            self.loaded.append(template_name)
+            return self.get_template(template_name, *args, **kwargs)
+        views.loader.get_template = get_template
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        views.loader.get_template = self.get_template
+        clear_template_cache()
+
+    def get_panel(self, name):
+        request = self.factory.get(
+            '/test/?{}={}'.format(PANEL_IDENTIFIER, name),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        return DashboardPage.as_view()(request)
+
+    def test_template_compiled_once(self):
+        self.get_panel('panel2')
+        self.get_panel('panel2')
+        self.assertEqual(self.loaded, ['tests/panel2_panel.html'])
+        self.assertEqual(
+            self.get_panel('panel1').status_code, 200
+        )
+        self.assertEqual(
+            self.loaded, ['tests/panel2_panel.html', 'tests/view1.html']
+        )
+
+    def test_template_name_follows_view_template(self):
+        view = DashboardPage()
+        view.dispatch(self.factory.get('/test/')).render()
+        panel = view.panels['panel2']
+        self.assertEqual(panel.get_template_name(), 'tests/panel2_panel.html')
+        view = DashboardPage(template_name='other/dashboard.html')
+        self.assertEqual(
+            DashboardView2(view, 'panel2').get_template_name(),
+            'other/panel2_panel.html'
+        )
+
+    def test_templates_reloaded_in_debug(self):
+        with override_settings(DEBUG=True):
+            self.get_panel('panel2')
+            self.get_panel('panel2')
+        self.assertEqual(len(self.loaded), 2)
+
+
+class CollectedMediaTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def setup_view(self, view_class):
+        view = view_class()
+        view._setup_panels(self.factory.get('/test/'))
+        return view
+
+    def test_media_collected_once(self):
+        media = self.setup_view(DashboardPage).media
+        self.assertTrue(media is self.setup_view(DashboardPage).media)
+        html = media.render()
+        self.assertTrue(html is media.render())
+        self.assertEqual(html.count('test.js'), 1)
+        self.assertTrue('test.css' in html)
+
+    def test_media_without_cache(self):
+        view = self.setup_view(UncachedMediaPage)
+        self.assertFalse(view.media is view.media)
+        self.assertEqual(view.media.render(), self.setup_view(DashboardPage).media.render())
+
+    def test_duplicate_media_merged(self):
+        view = self.setup_view(DashboardPage)
+        view.panels = PanelCollection(
+            list(view.panels.items())
+            + [('panel4', MediaPanel(view, 'panel4'))]
+        )
+        html = view.media.render()
+        self.assertEqual(html.count('test.js'), 1)
+        self.assertEqual(html.count('bootstrap.min.js'), 1)
+
+
+class PanelSpecsTestCase(SimpleTestCase):
+    def test_panel_specs(self):
+        self.assertEqual(
+            sorted(DashboardPage.panel_specs),
+            [
+                ('panel1', DashboardView1),
+                ('panel2', DashboardView2),
+                ('panel3', FormView),
+            ]
+        )
+        self.assertTrue(isinstance(DashboardPage.panel_specs, tuple))
+
+    def test_panel_specs_inherited(self):
+        self.assertEqual(
+            UncachedMediaPage.panel_specs, DashboardPage.panel_specs
+        )
+        self.assertEqual(LoginDashboardPage.panel_specs, ())
+
+
+class StreamingPageTestCase(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        del CONTEXT_CALLS[:]
+        self.factory = RequestFactory()
+
+    def test_shell_sent_before_panels_rendered(self):
+        resp = StreamingPage.as_view()(self.factory.get('/streaming/'))
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['X-Accel-Buffering'], 'no')
+        chunks = iter(resp.streaming_content)
+        shell = next(chunks)
+        self.assertEqual(CONTEXT_CALLS, [])
+        self.assertTrue('base.html' in shell)
+        self.assertTrue('test.js' in shell)
+        self.assertTrue('id="panelviews-panel1"' in shell)
+        self.assertFalse('additional_context' in shell)
+        rest = b''.join(chunks)
+        self.assertEqual(CONTEXT_CALLS, ['panel1'])
+        self.assertTrue('id="panelviews-panel1-content"' in rest)
+        self.assertTrue('With umlauts' in rest)
+        self.assertTrue('panel2' in rest)
+
+    def test_panels_streamed_in_completion_order(self):
+        resp = ConcurrentStreamingPage.as_view()(self.factory.get('/streaming/'))
+        chunks = list(resp.streaming_content)
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue('panelviews-fast-content' in chunks[1])
+        self.assertTrue('panelviews-slow-content' in chunks[2])
+
+
+class BatchedPanelsTestCase(SimpleTestCase):
+    def setUp(self):
+        del SET_UP_CALLS[:]
+        del CONTEXT_CALLS[:]
+        self.factory = RequestFactory()
+
+    def get_panels(self, view_class, *names, **kwargs):
+        query = '&'.join(
+            '{}={}'.format(PANEL_IDENTIFIER, name) for name in names
+        )
+        kwargs.setdefault('HTTP_X_REQUESTED_WITH', 'XMLHttpRequest')
+        request = self.factory.get('/counting/?' + query, **kwargs)
+        return view_class.as_view()(request)
+
+    def test_batched_panels(self):
+        resp = self.get_panels(CountingPage, 'panel3', 'panel1')
+        self.assertEqual(resp.status_code, 200)
+        data = json.loads(
+            resp.content.decode('utf-8'), object_pairs_hook=OrderedDict
+        )['panels']
+        self.assertEqual(list(data), ['panel3', 'panel1'])
+        self.assertEqual(data['panel1']['status'], 200)
+        self.assertTrue(u'panel1' in data['panel1']['content'])
+        self.assertTrue(u'öäüß' in data['panel3']['content'])
+        self.assertEqual(sorted(SET_UP_CALLS), ['panel1', 'panel3'])
+
+    def test_unknown_and_unavailable_panels(self):
+        resp = self.get_panels(CountingPage, 'panel1', 'hidden', 'unknown')
+        data = json.loads(resp.content.decode('utf-8'))['panels']
+        self.assertEqual(data['hidden'], {'status': 404, 'content': u''})
+        self.assertEqual(data['unknown'], {'status': 404, 'content': u''})
+        self.assertEqual(SET_UP_CALLS, ['panel1'])
+
+    def test_batched_panels_rendered_concurrently(self):
+        start = time.time()
+        resp = self.get_panels(ConcurrentPage, 'panel1', 'panel2', 'panel3')
+        self.assertTrue(time.time() - start < 0.75)
+        data = json.loads(resp.content.decode('utf-8'))['panels']
+        self.assertEqual(len(data), 3)
+
+    def test_eager_dispatch_renders_requested_panels(self):
+        resp = self.get_panels(EagerConcurrentPage, 'panel1', 'panel3')
+        data = json.loads(resp.content.decode('utf-8'))['panels']
+        self.assertEqual(sorted(data), ['panel1', 'panel3'])
+        self.assertEqual(sorted(CONTEXT_CALLS), ['panel1', 'panel3'])
+
+    def test_batched_panels_require_ajax(self):
+        resp = self.get_panels(
+            CountingPage, 'panel1', 'panel2', HTTP_X_REQUESTED_WITH=''
+        )
+        self.assertEqual(resp.status_code, 400)
+
+
+class ConditionalGetTestCase(SimpleTestCase):
+    def setUp(self):
+        del CONTEXT_CALLS[:]
+        VersionedPanel.version = 1
+        self.factory = RequestFactory()
+
+    def get(self, view_class, name=None, **headers):
+        url = '/conditional/'
+        if name:
+            url += '?{}={}'.format(PANEL_IDENTIFIER, name)
+            headers['HTTP_X_REQUESTED_WITH'] = 'XMLHttpRequest'
+        return view_class.as_view()(self.factory.get(url, **headers))
+
+    def test_panel_etag(self):
+        resp = self.get(ConditionalPage, 'versioned')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['ETag'], '"1"')
+        resp = self.get(ConditionalPage, 'versioned', HTTP_IF_NONE_MATCH='"1"')
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(CONTEXT_CALLS, ['versioned'])
+        VersionedPanel.version = 2
+        resp = self.get(ConditionalPage, 'versioned', HTTP_IF_NONE_MATCH='"1"')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(CONTEXT_CALLS), 2)
+
+    def test_panel_last_modified(self):
+        resp = self.get(ConditionalPage, 'modified')
+        last_modified = resp['Last-Modified']
+        resp = self.get(
+            ConditionalPage, 'modified', HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(CONTEXT_CALLS, ['modified'])
+
+    def test_page_etag(self):
+        resp = self.get(VersionedPage)
+        resp.render()
+        etag = resp['ETag']
+        resp = self.get(VersionedPage, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        VersionedPanel.version = 2
+        resp = self.get(VersionedPage, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_page_etag_skips_deferred_panels(self):
+        resp = self.get(LazyVersionedPage)
+        resp.render()
+        self.assertEqual(resp.status_code, 200)
+        etag = resp['ETag']
+        resp = self.get(LazyVersionedPage, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_page_without_panel_etags(self):
+        resp = self.get(ConditionalPage)
+        self.assertFalse(resp.has_header('ETag'))
+
+
+@override_settings(PANELVIEWS_METRICS_SINK='panelviews.metrics.LocalMetricsSink')
+class InstrumentationTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        get_metrics_sink().reset()
+        self.received = []
+        panel_timed.connect(self.receive)
+
+    def tearDown(self):
+        panel_timed.disconnect(self.receive)
+
+    def receive(self, sender, panel, timings, queries, **kwargs):
+        self.received.append((panel.name, dict(timings), queries))
+
+    def test_panel_request(self):
+        request = self.factory.get(
+            '/instrumented/?{}=query'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        resp = InstrumentedPage.as_view()(request)
+        self.assertEqual(len(self.received), 1)
+        name, timings, queries = self.received[0]
+        self.assertEqual(name, 'query')
+        self.assertEqual(
+            sorted(timings),
+            ['get_context_data', 'is_available', 'render', 'set_up']
+        )
+        self.assertEqual(queries, 1)
+        self.assertTrue('query.get_context_data;dur=' in resp['Server-Timing'])
+
+    def test_data_request(self):
+        request = self.factory.get(
+            '/instrumented/?{}=query&format=json'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        InstrumentedPage.as_view()(request)
+        name, timings, queries = self.received[0]
+        self.assertEqual(
+            sorted(timings),
+            ['get_context_data', 'is_available', 'serialize', 'set_up']
+        )
+        self.assertEqual(queries, 1)
+
+    def test_page_reported_after_render(self):
+        resp = InstrumentedPage.as_view()(self.factory.get('/instrumented/'))
+        self.assertEqual(self.received, [])
+        resp.render()
+        received = dict((name, timings) for name, timings, _ in self.received)
+        self.assertEqual(sorted(received), ['hidden', 'panel2', 'query'])
+        self.assertEqual(list(received['hidden']), ['is_available'])
+        self.assertTrue('panel2.render;dur=' in resp['Server-Timing'])
+        sink = get_metrics_sink()
+        self.assertEqual(sink.counters['InstrumentedPage.query.queries'], 1)
+        self.assertEqual(
+            len(sink.timings['InstrumentedPage.panel2.render']), 1
+        )
+
+    def test_disabled_by_default(self):
+        view = DashboardPage()
+        resp = view.dispatch(self.factory.get('/test/'))
+        resp.render()
+        self.assertFalse(resp.has_header('Server-Timing'))
+        self.assertEqual(self.received, [])
+        self.assertEqual(view.panels['panel1'].timer, views.NULL_TIMER)
+
+
+class ContentMemoizationTestCase(SimpleTestCase):
+    def setUp(self):
+        del CONTEXT_CALLS[:]
+        self.factory = RequestFactory()
+        view = ConditionalPage()
+        view._setup_panels(self.factory.get('/conditional/'))
+        self.panel = view.panels['versioned']
+
+    def test_content_rendered_once(self):
+        content = self.panel.content()
+        self.assertTrue(content is self.panel.content())
+        self.assertEqual(six.text_type(self.panel), content)
+        self.assertEqual(CONTEXT_CALLS, ['versioned'])
+
+    def test_context_not_mutated(self):
+        context = dict(self.panel.context)
+        self.panel.content()
+        self.assertEqual(self.panel.context, context)
+
+    def test_state_created_on_demand(self):
+        self.panel.content()
+        self.assertTrue(self.panel._context is None)
+        self.panel.context['extra'] = u'extra'
+        self.assertEqual(self.panel.context['panel'], self.panel)
+        url = self.panel.get_url()
+        self.assertEqual(url, u'/conditional/?panel=versioned')
+        self.assertTrue(url is self.panel.get_url())
+
+    def test_invalidate_content(self):
+        self.panel.content()
+        self.panel.invalidate_content()
+        self.panel.content()
+        self.assertEqual(CONTEXT_CALLS, ['versioned', 'versioned'])
+
+    def test_page_renders_panel_once(self):
+        view = ConditionalPage()
+        view.dispatch(self.factory.get('/conditional/')).render()
+        self.assertEqual(
+            sorted(CONTEXT_CALLS), ['modified', 'versioned']
+        )
+
+
+class DeferredPanelsTestCase(SimpleTestCase):
+    def setUp(self):
+        del SET_UP_CALLS[:]
+        self.factory = RequestFactory()
+
+    def test_deferred_panels_not_set_up(self):
+        view = DeferredPage()
+        resp = view.dispatch(self.factory.get('/deferred/'))
+        resp.render()
+        self.assertEqual(SET_UP_CALLS, ['panel1'])
+        self.assertTrue(view.panels['lazy'].deferred)
+        self.assertTrue(
+            'data-panel-url="/deferred/?{}=lazy" '
+            'data-load-strategy="visible"'.format(PANEL_IDENTIFIER)
+            in resp.content
+        )
+        self.assertTrue('data-load-strategy="idle"' in resp.content)
+        self.assertTrue('panelviews/js/panelviews.js' in resp.content)
+
+    def test_deferred_panel_request(self):
+        request = self.factory.get(
+            '/deferred/?{}=lazy'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        resp = DeferredPage.as_view()(request)
+        self.assertEqual(SET_UP_CALLS, ['lazy'])
+        self.assertTrue('With umlauts' in resp.content)
+        self.assertFalse('data-panel-url' in resp.content)
+
+    def test_no_loader_without_deferred_panels(self):
+        view = DashboardPage()
+        resp = view.dispatch(self.factory.get('/test/'))
+        resp.render()
+        self.assertFalse('panelviews.js' in resp.content)
+
+    def test_invalid_load_strategy(self):
+        view = DashboardPage()
+        panel = DashboardView1(view, 'panel1')
+        panel.load_strategy = 'later'
+        self.assertRaises(ValueError, panel.get_load_strategy)
+
+
+class AsyncPanelViewTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        del FAILURES[:]
+        FailingPanel.circuit_breaker.success()
+
+    def test_sync_panels_gathered_on_threads(self):
+        start = time.time()
+        resp = AsyncPage.as_view()(self.factory.get('/async/'))
+        resp.render()
+        # set_up and get_context_data of the panels overlap.
+        self.assertTrue(time.time() - start < 1)
+        self.assertTrue(b'panel3' in resp.content)
+
+    @unittest.skipIf(views.asyncio is None, 'asyncio not available')
+    def test_awaitables_gathered(self):
+        start = time.time()
+        resp = AwaitingPage.as_view()(self.factory.get('/async/'))
+        resp.render()
+        self.assertTrue(time.time() - start < 1)
+        self.assertTrue(b'awaited context' in resp.content)
+
+    def test_panel_timeout(self):
+        start = time.time()
+        resp = AsyncTimeoutPage.as_view()(self.factory.get('/async/'))
+        resp.render()
+        self.assertTrue(time.time() - start < 0.9)
+        self.assertTrue(b'timed out' in resp.content)
+        self.assertTrue(b'panel1' in resp.content)
+
+    def test_circuit_breaker(self):
+        views.logger.disabled = True
+        try:
+            for _ in range(3):
+                resp = AsyncFailingPage.as_view()(self.factory.get('/async/'))
+                resp.render()
+                self.assertEqual(resp.status_code, 200)
+        finally:
+            views.logger.disabled = False
+        self.assertEqual(len(FAILURES), 2)
+        self.assertTrue(FailingPanel.circuit_breaker.is_open)
+
+    @unittest.skipIf(views.asyncio is None, 'asyncio not available')
+    def test_awaitable_panel_in_sync_view(self):
+        request = self.factory.get(
+            '/async/?{}=panel1'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        resp = AwaitingPage.as_view()(request)
+        self.assertTrue(b'awaited context' in resp.content)
+
+
+class DataProvidersTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        del PROVIDER_CALLS[:]
+
+    def test_shared_data_loaded_once(self):
+        resp = ProviderPage.as_view()(self.factory.get('/providers/'))
+        resp.render()
+        # Dependencies first, every provider once, unused ones never.
+        self.assertEqual(PROVIDER_CALLS, ['contracts', 'shifts'])
+        self.assertTrue('contract2 shift' in resp.content)
+
+    def test_panel_request_loads_required_data(self):
+        request = self.factory.get(
+            '/providers/?{}=panel1'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        resp = ProviderPage.as_view()(request)
+        self.assertEqual(PROVIDER_CALLS, ['contracts'])
+        self.assertTrue('contract1, contract2' in resp.content)
+
+    def test_independent_providers_concurrent(self):
+        start = time.time()
+        ConcurrentProviderPage.as_view()(
+            self.factory.get('/providers/')
+        ).render()
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertEqual(PROVIDER_CALLS, ['slow', 'slow'])
+
+    def test_invalid_providers(self):
+        def cyclic(view, request, **kwargs):
+            pass
+        cyclic.requires = ('cyclic', )
+        for providers, panels in (
+                ({'cyclic': cyclic}, {}),
+                ({'shifts': load_shifts}, {}),
+                ({}, {'panel1': ContractsPanel})):
+            with self.assertRaises(ValueError):
+                type('ErrorPage', (BasePanelView, ), {
+                    'data_providers': providers,
+                    'panels': panels,
+                })
+
+
+class PanelEventsTestCase(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        PANEL_VERSION[0] = 1
+        self.factory = RequestFactory()
+
+    def events(self, names=('', ), change=None):
+        query = u'&'.join(
+            u'{}={}'.format(EVENTS_IDENTIFIER, name) for name in names
+        )
+        resp = EventsPage.as_view()(self.factory.get('/events/?' + query))
+        self.assertEqual(resp['Content-Type'], 'text/event-stream')
+        if change is not None:
+            threading.Timer(0.1, change).start()
+        events = b''.join(resp.streaming_content).split(b'\n\n')
+        return [
+            json.loads(event.split(b'data: ')[1].decode('utf-8'))
+            for event in events if event.startswith(b'event: panel')
+        ]
+
+    def stream(self, names=('', ), change=None):
+        return [event['name'] for event in self.events(names, change)]
+
+    def change_twice(self):
+        PANEL_VERSION[0] += 1
+        threading.Timer(0.2, self.change_once).start()
+
+    def change_once(self):
+        PANEL_VERSION[0] += 1
+
+    def test_notified_panel_sent(self):
+        names = self.stream(['notified'], NotifiedPanel.notify_changed)
+        self.assertEqual(names, ['notified'])
+
+    def test_changed_version_sent(self):
+        def change():
+            PANEL_VERSION[0] += 1
+        names = self.stream(['versioned'], change)
+        self.assertEqual(names, ['versioned'])
+
+    def test_cached_panel_rendered_again(self):
+        request = self.factory.get(
+            '/events/?{}=cached'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertTrue(b'state=1' in EventsPage.as_view()(request).content)
+        events = self.events(['cached'], self.change_once)
+        self.assertEqual(len(events), 1)
+        self.assertTrue(u'state=2' in events[0]['content'])
+
+    def test_provider_data_loaded_again(self):
+        events = self.events(['state'], self.change_twice)
+        self.assertEqual(len(events), 2)
+        self.assertTrue(u'state=2' in events[0]['content'])
+        self.assertTrue(u'state=3' in events[1]['content'])
+
+    def test_refresh_interval(self):
+        names = self.stream()
+        self.assertEqual(names, ['refreshed', 'refreshed'])
+
+    def test_events_url_and_script(self):
+        view = EventsPage()
+        view._setup_panels(self.factory.get('/events/'))
+        self.assertEqual(view.get_events_url(), u'/events/?events=')
+        self.assertTrue('panelviews/js/panelviews.js' in view.media.render())
+
+
+class DataModeTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_format_parameter(self):
+        request = self.factory.get(
+            '/data/?{}=data&format=json'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        resp = DataPage.as_view()(request)
+        self.assertEqual(resp['Content-Type'], 'application/json')
+        self.assertEqual(
+            json.loads(resp.content.decode('utf-8')),
+            {'day': '2016-01-02', 'count': 3}
+        )
+
+    def test_accept_header(self):
+        request = self.factory.get(
+            '/data/?{}=data'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            HTTP_ACCEPT='application/json'
+        )
+        resp = DataPage.as_view()(request)
+        self.assertEqual(resp['Content-Type'], 'application/json')
+        self.assertEqual(resp['Vary'], 'Accept')
+
+    def test_html_by_default(self):
+        request = self.factory.get(
+            '/test/?{}=panel1'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            HTTP_ACCEPT='text/html,application/json'
+        )
+        resp = DashboardPage.as_view()(request)
+        self.assertTrue(resp['Content-Type'].startswith('text/html'))
+
+    def test_opt_in(self):
+        request = self.factory.get(
+            '/test/?{}=panel3'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            HTTP_ACCEPT='application/json'
+        )
+        resp = DashboardPage.as_view()(request)
+        self.assertTrue(resp['Content-Type'].startswith('text/html'))
+        self.assertFalse(resp.has_header('Vary'))
+        request = self.factory.get(
+            '/test/?{}=panel3&format=json'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(DashboardPage.as_view()(request).status_code, 406)
+
+
+class ContextProcessorsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        del PROCESSOR_CALLS[:]
+
+    def test_panels_share_processor_output(self):
+        with self.settings(TEMPLATES=counting_templates()):
+            view = ProcessedPage()
+            request = self.factory.get('/processed/')
+            request.META['CSRF_COOKIE'] = 'a' * 32
+            view._setup_panels(request)
+            contents = [panel.content() for panel in view.panels.values()]
+        self.assertEqual(PROCESSOR_CALLS, ['/processed/'])
+        for content in contents:
+            self.assertTrue(u'processed context' in content)
+            self.assertTrue(u'csrfmiddlewaretoken' in content)
+
+    def test_declared_processors_only(self):
+        view = ProcessedPage()
+        request = self.factory.get('/processed/')
+        request.META['CSRF_COOKIE'] = 'a' * 32
+        panel = OwnProcessorsPanel(view, 'own')
+        panel.set_up(request)
+        content = panel.content()
+        self.assertEqual(PROCESSOR_CALLS, ['/processed/'])
+        self.assertTrue(u'processed context' in content)
+        self.assertFalse(u'csrfmiddlewaretoken' in content)
+
+
+class DegradedRenderingTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        del RENDER_ORDER[:]
+        del FAILURES[:]
+        FailingPanel.circuit_breaker.success()
+
+    def test_priority_order(self):
+        PrioritizedPage.as_view()(self.factory.get('/prioritized/')).render()
+        self.assertEqual(RENDER_ORDER[0], 'panel2')
+
+    def test_lazy_fallback(self):
+        start = time.time()
+        resp = DegradedPage.as_view()(self.factory.get('/degraded/'))
+        resp.render()
+        self.assertTrue(time.time() - start < 0.3)
+        self.assertTrue(
+            'data-panel-url="/degraded/?panel=panel2"' in resp.content
+        )
+        self.assertTrue('panelviews/js/panelviews.js' in resp.content)
+
+    def test_panel_request_not_deferred(self):
+        view = DegradedPage()
+        view._setup_named_panels(
+            self.factory.get('/degraded/?panel=panel2'), ['panel2']
+        )
+        self.assertEqual(view.panels['panel2'].fallback_content(), u'')
+
+    def test_circuit_breaker(self):
+        view = DashboardPage()
+        request = self.factory.get('/failing/')
+        contents = []
+        views.logger.disabled = True
+        try:
+            for _ in range(3):
+                panel = FailingPanel(view, 'failing')
+                panel.set_up(request)
+                contents.append(panel.content())
+        finally:
+            views.logger.disabled = False
+        self.assertEqual(contents, [u'', u'', u''])
+        # Skipped once the circuit is open.
+        self.assertEqual(len(FAILURES), 2)
+        self.assertTrue(FailingPanel.circuit_breaker.is_open)
+
+    def test_circuit_breaker_page_timeout(self):
+        HangingPanel.circuit_breaker.success()
+        for _ in range(3):
+            resp = HangingPage.as_view()(self.factory.get('/hanging/'))
+            resp.render()
+            # Let the late render finish on its worker.
+            time.sleep(0.35)
+        self.assertEqual(FAILURES, ['hanging', 'hanging'])
+        self.assertTrue(HangingPanel.circuit_breaker.is_open)
+
+
+class PanelCollectionTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_ordered_panels(self):
+        view = PrioritizedPage()
+        view._setup_panels(self.factory.get('/prioritized/'))
+        self.assertTrue(isinstance(view.panels, PanelCollection))
+        self.assertEqual(list(view.panels), ['panel1', 'panel2', 'panel3'])
+        page = define_page(dict(
+            ('panel{}'.format(index), DashboardView1) for index in range(12)
+        ))
+        self.assertEqual(
+            [spec.name for spec in page.panel_specs],
+            sorted('panel{}'.format(index) for index in range(12))
+        )
+
+    def test_immutable(self):
+        panels = PanelCollection([('panel1', None)])
+        with self.assertRaises(TypeError):
+            panels['panel2'] = None
+
+    def test_getitem(self):
+        view = StreamingPage()
+        view._setup_panels(self.factory.get('/streaming/'))
+        self.assertTrue(view['panel1'] is view.panels['panel1'])
+        # Attributes of the view win over panels of the same name.
+        self.assertFalse(view['media'] is view.panels['media'])
+        self.assertRaises(KeyError, lambda: view['unknown'])
+
+
+class CompressedPanelTestCase(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        return TablePage.as_view()(self.factory.get(
+            '/table/?{}=table'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest', **headers
+        ))
+
+    def test_minify_html(self):
+        self.assertEqual(
+            minify_html(u'<ul>\n  <li>a   b</li>\n</ul>\n<pre> x\n  y</pre>'),
+            u'<ul>\n<li>a b</li>\n</ul>\n<pre> x\n  y</pre>'
+        )
+        # Whitespace between inline elements is shown.
+        self.assertEqual(
+            minify_html(u'<p><b>Hello</b>\n  <i>World</i></p>'),
+            u'<p><b>Hello</b>\n<i>World</i></p>'
+        )
+
+    def test_uncompressed(self):
+        resp = self.get()
+        self.assertFalse(resp.has_header('Content-Encoding'))
+        self.assertEqual(resp['Vary'], 'Accept-Encoding')
+        self.assertTrue(
+            b'<tr>\n<td>1</td>\n<td>value of 1</td>\n</tr>' in resp.content
+        )
+        self.assertTrue(b'  keep   this' in resp.content)
+
+    def test_batch_not_compressed_per_panel(self):
+        resp = TablePage.as_view()(self.factory.get(
+            '/table/?{0}=table&{0}=table'.format(PANEL_IDENTIFIER),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            HTTP_ACCEPT_ENCODING='gzip, deflate'
+        ))
+        data = json.loads(resp.content.decode('utf-8'))['panels']
+        self.assertEqual(data['table']['status'], 200)
+        self.assertTrue(u'value of 1' in data['table']['content'])
+
+    def test_gzip(self):
+        plain = self.get().content
+        calls = []
+        compress_string = views.compress_string
+
+        def counting(content):
+            calls.append(content)
+            return compress_string(content)
+        views.compress_string = counting
+        try:
+            for _ in range(2):
+                resp = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+                self.assertEqual(resp['Content-Encoding'], 'gzip')
+                content = gzip.GzipFile(
+                    fileobj=six.BytesIO(resp.content)
+                ).read()
+                self.assertEqual(content, plain)
+        finally:
+            views.compress_string = compress_string
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(resp['ETag'].endswith(';gzip"'))
+        resp = self.get(
+            HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=resp['ETag']
+        )
+        self.assertEqual(resp.status_code, 304)
+
+
+class PaginatedPanelTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        for name in ('anna', 'bert', 'carl', 'dora', 'emil'):
+            User.objects.create(username=name)
+
+    def get(self, url, **headers):
+        return UsersPage.as_view()(self.factory.get(
+            url, HTTP_X_REQUESTED_WITH='XMLHttpRequest', **headers
+        ))
+
+    def test_first_page(self):
+        resp = UsersPage.as_view()(self.factory.get('/users/'))
+        resp.render()
+        self.assertTrue('emil' in resp.content and 'dora' in resp.content)
+        self.assertFalse('carl' in resp.content)
+        self.assertTrue('data-panel-next-url="/users/?panel=users&amp;cursor='
+                        in resp.content)
+        self.assertTrue('panelviews/js/panelviews.js' in resp.content)
+
+    def test_next_pages(self):
+        view = UsersPage()
+        view._setup_panels(self.factory.get('/users/'))
+        url = view.panels['users'].get_next_page_url()
+        resp = self.get(url)
+        self.assertFalse('<table>' in resp.content)
+        self.assertTrue('carl' in resp.content and 'bert' in resp.content)
+        self.assertFalse('dora' in resp.content)
+        view = UsersPage()
+        view._setup_named_panels(self.factory.get(url), ['users'])
+        resp = self.get(view.panels['users'].get_next_page_url())
+        self.assertTrue('anna' in resp.content)
+        self.assertFalse('data-panel-next-url' in resp.content)
+
+    def test_data_mode(self):
+        resp = self.get('/users/?panel=values&format=json')
+        data = json.loads(resp.content.decode('utf-8'))
+        self.assertEqual(
+            [row['username'] for row in data['object_list']],
+            ['anna', 'bert']
+        )
+        resp = self.get(u'/users/?panel=values&format=json&cursor={}'.format(
+            data['next_cursor']
+        ))
+        data = json.loads(resp.content.decode('utf-8'))
+        self.assertEqual(
+            [row['username'] for row in data['object_list']],
+            ['carl', 'dora']
+        )
+
+    def test_tampered_cursor(self):
+        # Answered with 400 by the request handler.
+        with self.assertRaises(SuspiciousOperation):
+            self.get('/users/?panel=users&cursor=1:abc')
+
+
+class WarmupTestCase(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        panel_cache_stats.reset()
+        clear_template_cache()
+
+    def test_find_panel_views(self):
+        found = find_panel_views()
+        self.assertTrue(FoundView('/test/', DashboardPage, {}) in found)
+        # Also behind decorators.
+        self.assertTrue(
+            FoundView('/test-login-required/', LoginDashboardPage, {})
+            in found
+        )
+
+    def test_warm_panels(self):
+        found_view = FoundView('/cached/', CachedPage, {})
+        self.assertEqual(
+            sorted(warm_panels(found_view)), ['cached', 'param', 'user']
+        )
+        self.assertEqual(
+            panel_cache_stats.get(CachedPanel.cache_label()),
+            {'hits': 0, 'misses': 1}
+        )
+        view = CachedPage()
+        view._setup_panels(RequestFactory().get('/cached/'))
+        view.panels['cached'].content()
+        self.assertEqual(
+            panel_cache_stats.get(CachedPanel.cache_label()),
+            {'hits': 1, 'misses': 1}
+        )
+
+    @override_settings(DEBUG=False)
+    def test_command(self):
+        out = six.StringIO()
+        call_command('warm_panels', render=True, stdout=out)
+        self.assertTrue('panelviews.tests.DashboardPage' in out.getvalue())
+        self.assertTrue('Warmed 3 panel views' in out.getvalue())
+        self.assertTrue('tests/view1.html' in views._templates)
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        del CONTEXT_CALLS[:]
+        self.factory = RequestFactory()
+
+    def get_panel(self):
+        view = CoalescedPage()
+        view._setup_named_panels(
+            self.factory.get('/coalesced/?panel=coalesced'), ['coalesced']
+        )
+        return view.panels['coalesced']
+
+    def test_concurrent_requests_render_once(self):
+        contents = []
+
+        def request():
+            resp = CoalescedPage.as_view()(self.factory.get(
+                '/coalesced/?{}=coalesced'.format(PANEL_IDENTIFIER),
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            ))
+            contents.append(resp.content)
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(CONTEXT_CALLS, ['coalesced'])
+        self.assertEqual(len(set(contents)), 1)
+
+    def test_stale_served_while_rendering(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def render():
+            started.set()
+            release.wait()
+            return u'fresh'
+        thread = threading.Thread(target=single_flight, args=('key', render))
+        thread.start()
+        started.wait()
+        self.assertEqual(
+            single_flight('key', lambda: u'other', stale=u'stale'), u'stale'
+        )
+        release.set()
+        thread.join()
+
+    def test_stale_content_rendered_again(self):
+        panel = self.get_panel()
+        key = panel.get_cache_key()
+        caches['default'].set(key, (u'stale', time.time() - 1), 60)
+        self.assertFalse(panel.content() == u'stale')
+        content, fresh_until = caches['default'].get(key)
+        self.assertTrue(fresh_until > time.time())
+        self.assertEqual(CONTEXT_CALLS, ['coalesced'])
+
+    def test_lock_of_other_process(self):
+        panel = self.get_panel()
+        key = panel.get_cache_key()
+        caches['default'].set(key, (u'stale', time.time() - 1), 60)
+        caches['default'].add(u'{}.lock'.format(key), 1, 5)
+        self.assertEqual(panel.content(), u'stale')
+        self.assertEqual(CONTEXT_CALLS, [])
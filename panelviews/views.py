@@ -1,87 +1,1291 @@
 # coding: utf-8
 
+import calendar
 import copy
+import functools
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from timeit import default_timer
+
 import six
 
+from six.moves import queue
+
 from django.views.generic import TemplateView
 from django.views.generic.base import ContextMixin
 from django.shortcuts import render, render_to_response
 from django.http import HttpResponseBadRequest, HttpResponse
-from django.template import RequestContext, loader
-from django.forms.widgets import media_property, Media
+from django.http import StreamingHttpResponse, JsonResponse
+from django.http import HttpResponseNotModified
+from django.template import Engine, loader
+from django.forms.widgets import media_property, Media, MEDIA_TYPES
+from django.forms.widgets import MediaDefiningClass
 from django.forms.forms import DeclarativeFieldsMetaclass
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import SuspiciousOperation
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import connections
+from django.utils import translation
+from django.utils.cache import patch_vary_headers
+from django.utils.html import format_html
+from django.utils.module_loading import import_string
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.utils.http import quote_etag
+from django.utils.safestring import mark_safe
+from django.utils.text import compress_string
+
+from panelviews.channels import panel_channel
+from panelviews.metrics import get_metrics_sink
+from panelviews.providers import ProvidedData, validate_providers
+from panelviews.signals import panel_timed
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import asyncio
+    import inspect
+    from concurrent.futures import Future, ThreadPoolExecutor
+except ImportError:  # Python 2
+    asyncio = None
 
 
+logger = logging.getLogger(__name__)
+
 PANEL_IDENTIFIER = 'panel'
+EVENTS_IDENTIFIER = 'events'
+FORMAT_IDENTIFIER = 'format'
+CURSOR_IDENTIFIER = 'cursor'
+CURSOR_SALT = 'panelviews.cursor'
+# Seconds compressed panel responses are cached for panels without
+# ``cache_timeout``.
+COMPRESSED_CACHE_TIMEOUT = 300
+# Elements whose content ``minify_html`` keeps as is.
+PRESERVED_ELEMENTS_RE = re.compile(
+    r'<(pre|textarea|script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL
+)
+# Seconds after which idle event streams send a comment to keep proxies
+# from closing the connection.
+EVENTS_KEEPALIVE = 15
+CACHE_KEY_PREFIX = 'panelviews'
+# Moves streamed panel content in place of its placeholder.
+STREAMED_PANEL_SCRIPT = (
+    u'<script>(function(p,c){{p=document.getElementById(p);'
+    u'c=document.getElementById(c);if(p&&c){{while(c.firstChild)'
+    u'{{p.parentNode.insertBefore(c.firstChild,p)}}'
+    u'p.parentNode.removeChild(p)}}if(c){{c.parentNode.removeChild(c)}}'
+    u'}})("{}","{}");</script>'
+)
+
+
+def _timestamp(last_modified):
+    if hasattr(last_modified, 'utctimetuple'):
+        return calendar.timegm(last_modified.utctimetuple())
+    return int(last_modified)
+
+
+def is_not_modified(request, etag=None, last_modified=None):
+    """
+    Whether the conditional headers of ``request`` match ``etag`` or
+    ``last_modified`` (a datetime or timestamp), so 304 can be returned.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and etag is not None:
+        # Compressed responses carry the encoding in their ETag.
+        etags = [
+            tag.rsplit(';', 1)[0] if tag.endswith((';gzip', ';br')) else tag
+            for tag in parse_etags(if_none_match)
+        ]
+        return six.text_type(etag) in etags or '*' in etags
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since and last_modified is not None:
+        since = parse_http_date_safe(if_modified_since)
+        return since is not None and _timestamp(last_modified) <= since
+    return False
+
+
+def minify_html(content):
+    """
+    Collapse the whitespace of the html fragment ``content``.
+
+    Runs of whitespace become a single newline if they contain one, else a
+    single space. ``pre``, ``textarea``, ``script`` and
+    ``style`` elements are kept as is.
+    """
+    parts = []
+    position = 0
+    for match in PRESERVED_ELEMENTS_RE.finditer(content):
+        parts.append(_collapse_whitespace(content[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_collapse_whitespace(content[position:]))
+    return mark_safe(u''.join(parts))
+
+
+def _collapse_whitespace(text):
+    text = re.sub(r'\s*\n\s*', '\n', text)
+    return re.sub(r'[ \t]{2,}', ' ', text)
+
+
+def accepted_encoding(request):
+    """
+    Best content encoding of ``request`` supported here, ``'br'`` if the
+    brotli package is installed, ``'gzip'`` or ``None``.
+    """
+    accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if brotli is not None and re.search(r'\bbr\b', accept):
+        return 'br'
+    if re.search(r'\bgzip\b', accept):
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content)
+    return compress_string(content)
+
+
+class CursorSerializer(object):
+    """
+    Serializer of pagination cursors, dates and decimals included.
+    """
+
+    def dumps(self, obj):
+        return json.dumps(
+            obj, separators=(',', ':'), cls=DjangoJSONEncoder
+        ).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+def wants_data(request):
+    """
+    Whether the panel data is requested instead of its html, by
+    ``?format=json`` or an ``Accept`` header preferring JSON.
+    """
+    data_format = request.GET.get(FORMAT_IDENTIFIER, None)
+    if data_format is not None:
+        return data_format == 'json'
+    accept = request.META.get('HTTP_ACCEPT', '')
+    return 'application/json' in accept and 'text/html' not in accept
+
+
+def set_conditional_headers(response, etag=None, last_modified=None):
+    if etag is not None:
+        response['ETag'] = quote_etag(six.text_type(etag))
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    return response
+
+
+class PanelTimer(object):
+    """
+    Milliseconds and database queries spent in the phases of a panel.
+    """
+
+    def __init__(self):
+        self.timings = OrderedDict()
+        self.queries = 0
+
+    def phase(self, name):
+        return _TimedPhase(self, name)
+
+
+class _TimedPhase(object):
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.connections = connections.all()
+        self.forced = [conn.force_debug_cursor for conn in self.connections]
+        self.queries = 0
+        for conn in self.connections:
+            conn.force_debug_cursor = True
+            self.queries += len(conn.queries_log)
+        self.start = default_timer()
+
+    def __exit__(self, *exc_info):
+        duration = (default_timer() - self.start) * 1000
+        timings = self.timer.timings
+        timings[self.name] = timings.get(self.name, 0) + duration
+        for conn, forced in zip(self.connections, self.forced):
+            self.queries -= len(conn.queries_log)
+            conn.force_debug_cursor = forced
+        self.timer.queries -= self.queries
+
+
+class _NullTimer(object):
+    """
+    Stands in for ``PanelTimer`` if instrumentation is disabled.
+    """
+    timings = {}
+    queries = 0
+
+    def phase(self, name):
+        return self
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = _NullTimer()
 
 
-class BasePanelView(six.with_metaclass(DeclarativeFieldsMetaclass, TemplateView)):
+class PanelCacheStats(object):
+    """
+    Process wide hit/miss counters of the panel content cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def _record(self, label, index):
+        with self._lock:
+            counts = self._counts.setdefault(label, [0, 0])
+            counts[index] += 1
+
+    def hit(self, label):
+        self._record(label, 0)
+
+    def miss(self, label):
+        self._record(label, 1)
+
+    def get(self, label):
+        hits, misses = self._counts.get(label, (0, 0))
+        return {'hits': hits, 'misses': misses}
+
+    def as_dict(self):
+        with self._lock:
+            return dict(
+                (label, {'hits': hits, 'misses': misses})
+                for label, (hits, misses) in self._counts.items()
+            )
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+panel_cache_stats = PanelCacheStats()
+
+# Panel template names per (view template name, panel template suffix),
+# compiled templates per template name and imported context processors per
+# tuple of paths.
+_template_names = {}
+_templates = {}
+_context_processors = {}
+
+
+def get_panel_template(template_name):
+    """
+    Return the compiled template ``template_name``.
+
+    Templates are compiled once per process. With ``DEBUG`` enabled they are
+    loaded on every call so changes show up without a restart.
+    """
+    if settings.DEBUG:
+        return loader.get_template(template_name)
+    try:
+        return _templates[template_name]
+    except KeyError:
+        return _templates.setdefault(
+            template_name, loader.get_template(template_name)
+        )
+
+
+def get_context_processors(paths=None):
+    """
+    Return the context processor functions of ``paths``, dotted paths or
+    callables, or of the default template engine if ``paths`` is ``None``.
+    """
+    if paths is None:
+        return Engine.get_default().template_context_processors
+    paths = tuple(paths)
+    try:
+        return _context_processors[paths]
+    except KeyError:
+        return _context_processors.setdefault(paths, tuple(
+            import_string(path) if isinstance(path, six.string_types)
+            else path
+            for path in paths
+        ))
+
+
+def run_context_processors(request, processors):
+    context = {}
+    for processor in processors:
+        context.update(processor(request))
+    return context
+
+
+def clear_template_cache(**kwargs):
+    _template_names.clear()
+    _templates.clear()
+    _context_processors.clear()
+
+
+def _template_setting_changed(setting, **kwargs):
+    if setting in ('DEBUG', 'TEMPLATES'):
+        clear_template_cache()
+
+
+setting_changed.connect(_template_setting_changed)
+
+
+class CollectedMedia(Media):
+    """
+    Media of a view and its panels, rendered to html only once.
+    """
+    _rendered = None
+
+    def render(self):
+        if self._rendered is None:
+            self._rendered = super(CollectedMedia, self).render()
+        return self._rendered
+
+
+# Collected media per (view class, panel classes and deferred flags).
+_collected_media = {}
+# Loads deferred panels in the browser.
+DEFERRED_PANELS_MEDIA = Media(js=('panelviews/js/panelviews.js', ))
+LOAD_STRATEGIES = ('inline', 'visible', 'idle')
+
+
+def collect_media(media_list):
+    """
+    Merge ``media_list`` into a single ``CollectedMedia``.
+
+    Unlike chaining ``Media.__add__`` every media is merged in place once.
+    """
+    collected = CollectedMedia()
+    for media in media_list:
+        for name in MEDIA_TYPES:
+            getattr(collected, 'add_' + name)(
+                getattr(media, '_' + name, None)
+            )
+    return collected
+
+
+def _media_setting_changed(setting, **kwargs):
+    if setting in ('STATIC_URL', 'MEDIA_URL', 'STATICFILES_STORAGE'):
+        _collected_media.clear()
+
+
+setting_changed.connect(_media_setting_changed)
+
+
+def _call_in_thread(language, function, *args):
+    if language:
+        translation.activate(language)
+    try:
+        return function(*args)
+    finally:
+        # Every thread has its own connections, do not leak them.
+        connections.close_all()
+        translation.deactivate()
+
+
+def _run_concurrently(items, function, max_workers, timeout=None,
+                      timeouts=None):
+    """
+    Call ``function`` for every item on at most ``max_workers`` threads.
+
+    Yields ``(item, result)`` in the order the calls finish. Items not
+    finished after ``timeout`` seconds, or their entry of ``timeouts``, are
+    yielded with ``None`` as result. Items are started in order.
+    Exceptions are re-raised in the caller. The threads take over the
+    active language and close their database connections.
+    """
+    items = list(items)
+    tasks = queue.Queue()
+    done = queue.Queue()
+    for index in range(len(items)):
+        tasks.put(index)
+    language = translation.get_language()
+
+    def worker():
+        while True:
+            try:
+                index = tasks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = _call_in_thread(language, function, items[index])
+                done.put((index, result, None))
+            except Exception:
+                done.put((index, None, sys.exc_info()))
+
+    for _ in range(min(max_workers, len(items))):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+    started = time.time()
+    deadlines = {}
+    for index in range(len(items)):
+        limits = [timeout]
+        if timeouts is not None:
+            limits.append(timeouts[index])
+        limits = [limit for limit in limits if limit is not None]
+        if limits:
+            deadlines[index] = started + min(limits)
+    pending = set(range(len(items)))
+    while pending:
+        remaining = None
+        pending_deadlines = [
+            deadlines[index] for index in pending if index in deadlines
+        ]
+        if pending_deadlines:
+            remaining = max(min(pending_deadlines) - time.time(), 0)
+        try:
+            index, result, exc_info = done.get(timeout=remaining)
+        except queue.Empty:
+            now = time.time()
+            for index in sorted(pending):
+                if index in deadlines and deadlines[index] <= now:
+                    pending.discard(index)
+                    yield items[index], None
+            continue
+        pending.discard(index)
+        if exc_info is not None:
+            six.reraise(*exc_info)
+        yield items[index], result
+
+
+def _render_panels_concurrently(panels, max_workers, timeout=None):
+    """
+    Render ``panels`` on at most ``max_workers`` threads, in the order of
+    their ``priority``.
+
+    Yields ``(panel, content)`` in the order the panels finish, ``None`` as
+    content for panels not finished after ``timeout`` seconds or their
+    ``render_timeout``. Workers don't touch ``prerendered_content``, late
+    renders must not replace the fallback content of timed out panels.
+    """
+    panels = sorted(panels, key=lambda panel: -panel.priority)
+    started = time.time()
+    deadlines = {}
+    for panel in panels:
+        limits = [
+            limit for limit in (timeout, panel.render_timeout)
+            if limit is not None
+        ]
+        if limits:
+            deadlines[panel] = started + min(limits)
+    return _run_concurrently(
+        panels,
+        lambda panel: panel._guarded_content(deadlines.get(panel, None)),
+        max_workers, timeout, [panel.render_timeout for panel in panels]
+    )
+
+
+class CircuitBreaker(object):
+    """
+    Skips a panel after ``failure_threshold`` consecutive failures.
+
+    Failures are exceptions and renders exceeding ``Panel.render_timeout``.
+    After ``reset_timeout`` seconds one request tries the panel again and
+    closes the circuit if it succeeds. Assign an instance to
+    ``Panel.circuit_breaker``; it is shared by all instances of the panel
+    class within the process.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.time() - self._opened_at < self.reset_timeout:
+                return False
+            # Let this request try the panel, keep the others out.
+            self._opened_at = time.time()
+            return True
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.time()
+
+
+class _Flight(object):
+    """
+    A render other threads of the process wait for.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(key, function, stale=None, timeout=None):
+    """
+    Call ``function`` once for concurrent calls with the same ``key`` within
+    the process.
+
+    The first caller calls ``function``; the others return ``stale`` if it
+    is not ``None``, else wait up to ``timeout`` seconds for the result of
+    the first call. If the wait times out they call ``function`` themselves.
+    """
+    with _flights_lock:
+        flight = _flights.get(key, None)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        if stale is not None:
+            return stale
+        if flight.done.wait(timeout):
+            if flight.exc_info is not None:
+                six.reraise(*flight.exc_info)
+            return flight.result
+        return function()
+    try:
+        flight.result = function()
+    except Exception:
+        flight.exc_info = sys.exc_info()
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.result
+
+
+def _is_awaitable(value):
+    return asyncio is not None and inspect.isawaitable(value)
+
+
+def resolve(value):
+    """
+    Return ``value`` or its result if it is awaitable, e.g. the coroutine
+    returned by an ``async def get_context_data``.
+    """
+    if not _is_awaitable(value):
+        return value
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(value)
+    finally:
+        loop.close()
+
+
+def _await_result(loop, future):
+    """
+    Future of the result of ``future``, awaited first if it is awaitable.
+    """
+    outer = loop.create_future()
+
+    def copy_result(source):
+        if source.exception() is not None:
+            outer.set_exception(source.exception())
+        elif _is_awaitable(source.result()):
+            asyncio.ensure_future(
+                source.result(), loop=loop
+            ).add_done_callback(copy_result)
+        else:
+            outer.set_result(source.result())
+
+    future.add_done_callback(copy_result)
+    return outer
+
+
+def gather(functions, max_workers):
+    """
+    Call ``functions`` concurrently and return their results in order.
+
+    Functions run on at most ``max_workers`` threads. Awaitable results,
+    e.g. of ``async def`` methods, are awaited together on one event loop
+    while the other functions are still running.
+    """
+    if asyncio is None:
+        results = [None] * len(functions)
+        for index, result in _run_concurrently(
+                range(len(functions)),
+                lambda index: functions[index](),
+                max_workers):
+            results[index] = result
+        return results
+    language = translation.get_language()
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers)
+    try:
+        futures = [
+            _await_result(loop, loop.run_in_executor(
+                executor, _call_in_thread, language, function
+            ))
+            for function in functions
+        ]
+        return loop.run_until_complete(asyncio.gather(*futures))
+    finally:
+        executor.shutdown(wait=False)
+        loop.close()
+
+
+def start_gather(functions, max_workers):
+    """
+    Start ``functions`` like ``gather()`` without waiting for them.
+
+    Returns a ``concurrent.futures.Future`` per function. The event loop
+    runs on its own thread until all functions finished, callers waiting
+    for a result may give up earlier. Python 3 only.
+    """
+    results = [Future() for _ in functions]
+    if not functions:
+        return results
+    language = translation.get_language()
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers)
+
+    def copy_result(result, source):
+        if source.exception() is not None:
+            result.set_exception(source.exception())
+        else:
+            result.set_result(source.result())
+
+    def run():
+        try:
+            futures = [
+                _await_result(loop, loop.run_in_executor(
+                    executor, _call_in_thread, language, function
+                ))
+                for function in functions
+            ]
+            for future, result in zip(futures, results):
+                future.add_done_callback(
+                    functools.partial(copy_result, result)
+                )
+            loop.run_until_complete(
+                asyncio.gather(*futures, return_exceptions=True)
+            )
+        finally:
+            executor.shutdown(wait=False)
+            loop.close()
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return results
+
+
+PanelSpec = namedtuple('PanelSpec', ['name', 'panel_class'])
+
+
+class PanelCollection(Mapping):
+    """
+    Immutable mapping of panel names to panels in a fixed order.
+    """
+
+    def __init__(self, items=()):
+        items = list(items)
+        self._names = tuple(name for name, _ in items)
+        self._panels = dict(items)
+
+    def __getitem__(self, name):
+        return self._panels[name]
+
+    def __contains__(self, name):
+        return name in self._panels
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    # Faster than the generic implementations of ``Mapping``.
+    def keys(self):
+        return list(self._names)
+
+    def values(self):
+        return [self._panels[name] for name in self._names]
+
+    def items(self):
+        return [(name, self._panels[name]) for name in self._names]
+
+    def __repr__(self):
+        return '<PanelCollection: {}>'.format(', '.join(self._names))
+
+
+def _set_up_panel(panel, request):
+    with panel.timer.phase('set_up'):
+        return panel.set_up(request)
+
+
+def _get_context_data(panel):
+    with panel.timer.phase('get_context_data'):
+        return panel.get_context_data()
+
+
+class PanelViewMetaclass(MediaDefiningClass):
+    """
+    Validates the ``panels`` and ``data_providers`` of a view once when the
+    class is created.
+
+    The panels are stored as ``panel_specs``, a tuple of ``PanelSpec``, and
+    indexed by name, so requests only instantiate the panels. Panels keep
+    the order of an ``OrderedDict`` or ``PanelCollection``, plain dicts are
+    ordered by name.
+    """
+
+    def __new__(mcs, name, bases, attrs):
+        new_class = super(PanelViewMetaclass, mcs).__new__(
+            mcs, name, bases, attrs
+        )
+        specs = []
+        for panel_name, panel_class in new_class.panels.items():
+            if not isinstance(panel_name, six.string_types):
+                raise ValueError(
+                    u'panel name must be string not {}'.format(
+                        panel_name.__class__
+                    )
+                )
+            if not (isinstance(panel_class, type)
+                    and issubclass(panel_class, Panel)):
+                raise ValueError(
+                    'Tab must be instance of Panel. found %s' % panel_class
+                )
+            specs.append(PanelSpec(panel_name, panel_class))
+        if type(new_class.panels) is dict:
+            specs.sort()
+        validate_providers(new_class.data_providers)
+        for spec in specs:
+            for data_name in spec.panel_class.requires_data:
+                if data_name not in new_class.data_providers:
+                    raise ValueError(
+                        u'panel {!r} requires unknown data {!r}'.format(
+                            spec.name, data_name
+                        )
+                    )
+        new_class.panel_specs = tuple(specs)
+        new_class._panel_index = dict((spec.name, spec) for spec in specs)
+        # Panels named like attributes of the view, e.g. ``media``, are
+        # looked up after the attributes by ``__getitem__``.
+        new_class._shadowed_panels = frozenset(
+            spec.name for spec in specs if hasattr(new_class, spec.name)
+        )
+        return new_class
+
+
+class BasePanelView(six.with_metaclass(PanelViewMetaclass, TemplateView)):
     panels = {}
     url = None
+    # Functions loading data shared by the panels, see
+    # ``panelviews.providers``. Loaded once per request into ``data``.
+    data_providers = {}
+    data = None
+    _processor_context = None
+    # Load independent data providers on a thread pool.
+    load_data_concurrently = False
+    # Set up only the requested panel on ``?panel=<name>`` requests instead
+    # of every panel of the view.
+    lazy_panel_dispatch = True
+    # Render all panels on a thread pool before the page template is
+    # rendered. Useful if panels spend their time waiting for I/O.
+    render_panels_concurrently = False
+    max_render_workers = 4
+    # Seconds to wait for the concurrently rendered panels; panels not done
+    # in time render ``Panel.timeout_content()`` instead.
+    panel_render_timeout = None
+    # Stream the page with placeholders right away, followed by every panel
+    # as soon as it is rendered.
+    stream_panels = False
+    # Record the time and queries spent per panel and phase. Reported as
+    # Server-Timing header, ``panel_timed`` signal and to the metrics sink.
+    instrument_panels = False
+    # Event streams (``?events``) check ``Panel.get_version()`` every
+    # ``events_poll_interval`` seconds and end after ``events_max_duration``
+    # seconds, the browser reconnects then.
+    events_poll_interval = 1
+    events_max_duration = 300
+    # Cache the collected media per view class and set of panels. Disable it
+    # if the media of a panel depends on the request.
+    cache_media = True
 
     @property
     def media(self):
         """
         Collect Media.
         """
-        media = Media()
-        for panel in self.panels.values():
-            media = media + panel.media
-        return media
+        panels = list(self.panels.values())
+        if not self.cache_media:
+            return self._collect_media(panels)
+        key = (self.__class__, tuple(
+            (panel.__class__, panel.deferred) for panel in panels
+        ))
+        try:
+            return _collected_media[key]
+        except KeyError:
+            return _collected_media.setdefault(
+                key, self._collect_media(panels)
+            )
+
+    def _collect_media(self, panels):
+        media_list = [panel.media for panel in panels]
+        if any(panel.deferred or panel.refresh_interval or panel.paginate_by
+               or panel.fallback == 'lazy' for panel in panels):
+            media_list.append(DEFERRED_PANELS_MEDIA)
+        return collect_media(media_list)
 
     def __init__(self,  *args, **kwargs):
         super(BasePanelView, self).__init__(*args, **kwargs)
-        for name in self.panels.keys():
-            if not isinstance(name, basestring):
-                raise ValueError(
-                    u'panel name must be string not {}'.format(name.__class__)
-                )
         self.context = {'view': self, }
+        self._panels_set_up = False
+        self._timed_panels = []
 
-    def _setup_panels(self, request):
-        panels = {}
-        for name, panel_class in self.panels.items():
-            try:
-                panel = panel_class(self, name)
-            except TypeError:
-                raise ValueError(
-                    'Tab must be instance of Panel. found %s'
-                    % panel_class
-                )
-            if not isinstance(panel, Panel):
-                raise ValueError(
-                    'Tab must be instance of Panel. found %s'
-                    % panel.__class__
-                )
-            if panel.is_available(self, request):
-                panel.set_up(request)
-                panels[panel.name] = panel
-        self.panels = panels
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super(BasePanelView, cls).as_view(**initkwargs)
+        # Set by Django itself from 1.9 on, ``panelviews.warmup`` finds the
+        # panel views of the URLconf with them.
+        view.view_class = cls
+        view.view_initkwargs = initkwargs
+        return view
+
+    def _init_panel(self, request, name, panel_class, defer=False):
+        """
+        Instantiate the panel if it is available, else return ``None``.
+
+        With ``defer`` panels loaded by the browser are marked as deferred.
+        """
+        panel = panel_class(self, name)
+        if self.instrument_panels:
+            panel.timer = PanelTimer()
+            self._timed_panels.append(panel)
+        with panel.timer.phase('is_available'):
+            if not panel.is_available(self, request):
+                return None
+        if defer and panel.get_load_strategy() != 'inline':
+            panel.deferred = True
+        return panel
+
+    def _build_panels(self, request, specs, defer=False):
+        """
+        Instantiate the available panels of ``specs`` and set them up.
+
+        Returns a ``PanelCollection``. Deferred panels are not set up.
+        """
+        if self.data is None:
+            self.data = ProvidedData(self, request, self.data_providers)
+        panels = []
+        for name, panel_class in specs:
+            panel = self._init_panel(request, name, panel_class, defer)
+            if panel is not None:
+                panels.append((name, panel))
+        panels = PanelCollection(panels)
+        self.set_up_panels(request, [
+            panel for panel in panels.values() if not panel.deferred
+        ])
+        return panels
+
+    def set_up_panels(self, request, panels):
+        for panel in panels:
+            resolve(_set_up_panel(panel, request))
+
+    def load_panel_data(self, panels):
+        """
+        Load the data required by ``panels`` before they are rendered.
+
+        Skips deferred panels and panels caching their content, they load
+        their data on access if they are rendered at all.
+        """
+        names = []
+        for panel in panels:
+            if panel.deferred or panel.cache_timeout is not None:
+                continue
+            for name in panel.requires_data:
+                if name not in names:
+                    names.append(name)
+        max_workers = 1
+        if self.load_data_concurrently:
+            max_workers = self.max_render_workers
+        self.data.load(names, max_workers)
+
+    def _setup_panels(self, request, defer=False):
+        if self._panels_set_up:
+            return
+        self.url = request.path
+        self.panels = self._build_panels(request, self.panel_specs, defer)
+        self._panels_set_up = True
+
+    def _setup_named_panels(self, request, names):
+        """
+        Set up only the panels ``names``.
+
+        Returns the available panels by name. Unknown or unavailable names
+        are skipped and the other panels of the view are left untouched.
+        """
         self.url = request.path
+        specs = []
+        for name in names:
+            spec = self._panel_index.get(name, None)
+            if spec is not None and spec not in specs:
+                specs.append(spec)
+        panels = self._build_panels(request, specs)
+        if panels:
+            self.panels = panels
+            self._panels_set_up = True
+        return panels
+
+    def get_requested_panels(self, request):
+        """
+        Return the set up panels addressed by ``?panel=<name>`` by name.
+        """
+        names = request.GET.getlist(PANEL_IDENTIFIER)
+        if self.lazy_panel_dispatch:
+            return self._setup_named_panels(request, names)
+        self._setup_panels(request)
+        return PanelCollection(
+            (name, self.panels[name]) for name in names if name in self.panels
+        )
+
+    def get_requested_panel(self, request):
+        """
+        Return the set up panel addressed by ``?panel=<name>`` or ``None``.
+        """
+        panel_name = request.GET.get(PANEL_IDENTIFIER, None)
+        if not panel_name:
+            return None
+        return self.get_requested_panels(request).get(panel_name, None)
+
+    def get_panels_response(self, request, names):
+        """
+        Render several panels for one request.
+
+        Returns JSON mapping every requested name to the ``status`` and
+        ``content`` of the panel response. Unknown or unavailable panels get
+        status 404. The requested panels are set up together and rendered
+        concurrently if ``render_panels_concurrently`` is set.
+        """
+        panels = self.get_requested_panels(request)
+        if panels:
+            self.load_panel_data(panels.values())
+        data_mode = wants_data(request) and all(
+            panel.serve_data for panel in panels.values()
+        )
+        if panels and self.render_panels_concurrently and not data_mode:
+            self.render_panels(panels.values())
+        data = OrderedDict()
+        for name in names:
+            if name not in panels:
+                data[name] = {'status': 404, 'content': u''}
+                continue
+            response = panels[name].get(request)
+            data[name] = {
+                'status': response.status_code,
+                'content': response.content.decode(response.charset),
+            }
+        return JsonResponse({'panels': data})
 
     def get_url(self):
         return self.url
 
+    def render_panels(self, panels=None):
+        """
+        Render ``panels``, by default all set up panels, concurrently.
+
+        The template afterwards picks up the finished content of the panels.
+        """
+        if panels is None:
+            panels = self.panels.values()
+        panels = [panel for panel in panels if not panel.deferred]
+        for panel, content in _render_panels_concurrently(
+                panels,
+                self.max_render_workers,
+                self.panel_render_timeout):
+            if content is None:
+                if panel.circuit_breaker is not None:
+                    panel.circuit_breaker.failure()
+                content = panel.fallback_content()
+            panel.prerendered_content = content
+
+    def render_to_streaming_response(self, context):
+        """
+        Return a ``StreamingHttpResponse`` of the page.
+
+        The page is rendered with panel placeholders and sent first. Panels
+        follow in the order they finish and replace their placeholders.
+        """
+        panels = [
+            panel for panel in self.panels.values() if not panel.deferred
+        ]
+        for panel in panels:
+            panel.prerendered_content = panel.placeholder()
+        page = self.render_to_response(context)
+        shell = page.rendered_content
+        for panel in panels:
+            panel.prerendered_content = None
+        index = shell.lower().rfind(u'</body>')
+        if index == -1:
+            index = len(shell)
+        response = StreamingHttpResponse(
+            self._stream_panels(shell[:index], panels, shell[index:]),
+            content_type=page['Content-Type'],
+            status=page.status_code,
+        )
+        # Keep proxies like nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _stream_panels(self, head, panels, tail):
+        yield head
+        if self.render_panels_concurrently:
+            rendered = _render_panels_concurrently(
+                panels, self.max_render_workers, self.panel_render_timeout
+            )
+        else:
+            rendered = ((panel, panel.content()) for panel in panels)
+        for panel, content in rendered:
+            if content is None:
+                if panel.circuit_breaker is not None:
+                    panel.circuit_breaker.failure()
+                content = panel.fallback_content()
+            yield panel.streamed_content(content)
+        yield tail
+
+    def get_processor_context(self, request):
+        """
+        Output of the context processors of the default template engine,
+        evaluated once per request and shared by the panels.
+        """
+        if self._processor_context is None:
+            self._processor_context = run_context_processors(
+                request, get_context_processors()
+            )
+        return self._processor_context
+
+    def get_events_url(self):
+        return u'{}?{}='.format(self.get_url(), EVENTS_IDENTIFIER)
+
+    def get_events_response(self, request, names):
+        """
+        Return a Server-Sent Events stream of changed panels.
+
+        Streams the panels ``names``, or all panels without names. A panel
+        is re-rendered and sent when ``Panel.notify_changed()`` is called,
+        its ``get_version()`` changes or its ``refresh_interval`` passed.
+        Re-rendered panels skip their cached content and load the data of
+        the view's providers again.
+        """
+        if not names:
+            names = [spec.name for spec in self.panel_specs]
+        panels = self._setup_named_panels(request, names)
+        response = StreamingHttpResponse(
+            self._stream_events(panels),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _stream_events(self, panels):
+        versions = dict(
+            (name, panel.get_version()) for name, panel in panels.items()
+        )
+        labels = panel_channel.versions(
+            panel.cache_label() for panel in panels.values()
+        )
+        now = time.time()
+        end = now + self.events_max_duration
+        keepalive = now + EVENTS_KEEPALIVE
+        refresh_at = dict(
+            (name, now + panel.refresh_interval)
+            for name, panel in panels.items() if panel.refresh_interval
+        )
+        yield u'retry: {}\n\n'.format(int(self.events_poll_interval * 1000))
+        while True:
+            now = time.time()
+            if now >= end:
+                return
+            timeout = min(
+                [end, now + self.events_poll_interval]
+                + list(refresh_at.values())
+            ) - now
+            current = panel_channel.wait(labels, max(timeout, 0))
+            changed = set(
+                label for label in labels if current[label] != labels[label]
+            )
+            labels = current
+            now = time.time()
+            outdated = []
+            for name, panel in panels.items():
+                version = panel.get_version()
+                due = name in refresh_at and refresh_at[name] <= now
+                if not (due or version != versions[name]
+                        or panel.cache_label() in changed):
+                    continue
+                versions[name] = version
+                if name in refresh_at:
+                    refresh_at[name] = now + panel.refresh_interval
+                outdated.append(panel)
+            if outdated:
+                # Streams outlive the data loaded for their first events.
+                self.data = ProvidedData(
+                    self, self.request, self.data_providers
+                )
+                self._processor_context = None
+            for panel in outdated:
+                panel.invalidate_content()
+                if panel.cache_timeout is not None:
+                    panel.delete_cached_content()
+                yield panel.event(panel.content())
+            if outdated:
+                keepalive = now + EVENTS_KEEPALIVE
+            elif now >= keepalive:
+                keepalive = now + EVENTS_KEEPALIVE
+                yield u':\n\n'
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super(BasePanelView, self).dispatch(
+            request, *args, **kwargs
+        )
+        if self.instrument_panels:
+            self._instrument_response(response)
+        return response
+
+    def _instrument_response(self, response):
+        if getattr(response, 'streaming', False):
+            # Headers are gone once the panels are rendered.
+            response.streaming_content = self._report_after(
+                response.streaming_content
+            )
+        elif not getattr(response, 'is_rendered', True):
+            response.add_post_render_callback(self.report_timings)
+        else:
+            self.report_timings(response)
+
+    def _report_after(self, content):
+        for chunk in content:
+            yield chunk
+        self.report_timings()
+
+    def report_timings(self, response=None):
+        """
+        Report the timings of all instantiated panels.
+        """
+        sink = get_metrics_sink()
+        server_timing = []
+        for panel in self._timed_panels:
+            timer = panel.timer
+            panel_timed.send(
+                sender=self.__class__, view=self, panel=panel,
+                timings=timer.timings, queries=timer.queries
+            )
+            metric = u'{}.{}'.format(self.__class__.__name__, panel.name)
+            for phase, duration in timer.timings.items():
+                server_timing.append(u'{}.{};dur={:.3f}'.format(
+                    panel.name, phase, duration
+                ))
+                if sink is not None:
+                    sink.timing(u'{}.{}'.format(metric, phase), duration)
+            if sink is not None:
+                sink.incr(u'{}.queries'.format(metric), timer.queries)
+        if response is not None and server_timing:
+            response['Server-Timing'] = u', '.join(server_timing)
+
     def get(self, request, *args, **kwargs):
-        self._setup_panels(request)
         self.request = request
-        panel_name = request.GET.get(PANEL_IDENTIFIER, None)
-        if panel_name and panel_name in self.panels.keys():
+        if EVENTS_IDENTIFIER in request.GET:
+            return self.get_events_response(request, [
+                name for name in request.GET.getlist(EVENTS_IDENTIFIER)
+                if name
+            ])
+        names = request.GET.getlist(PANEL_IDENTIFIER)
+        if len(names) > 1:
             if not request.is_ajax():
                 return HttpResponseBadRequest()
-            return self.panels[panel_name].get(request)
+            return self.get_panels_response(request, names)
+        panel = self.get_requested_panel(request)
+        if panel is not None:
+            if not request.is_ajax():
+                return HttpResponseBadRequest()
+            return panel.get(request)
 
+        self._setup_panels(request, defer=True)
+        etag = self.get_etag()
+        if is_not_modified(request, etag):
+            return set_conditional_headers(HttpResponseNotModified(), etag)
         self.context.update(self.get_context_data(**kwargs))
         self.context.update(self.base_context_data())
-        return self.render_to_response(self.context)
+        self.load_panel_data(self.panels.values())
+        if self.stream_panels:
+            response = self.render_to_streaming_response(self.context)
+        else:
+            if self.render_panels_concurrently:
+                self.render_panels()
+            response = self.render_to_response(self.context)
+        return set_conditional_headers(response, etag)
+
+    def get_etag(self):
+        """
+        ETag of the page built from the ETags of all its inline panels.
+
+        ``None`` if a panel does not provide an ETag. Deferred panels are
+        not set up and only show a fixed placeholder, they are skipped.
+        Override if the page context itself changes independently of the
+        panels.
+        """
+        parts = [self.__class__.__module__, self.__class__.__name__]
+        for name in sorted(self.panels):
+            if self.panels[name].deferred:
+                continue
+            etag = self.panels[name].get_etag()
+            if etag is None:
+                return None
+            parts.append(u'{}={}'.format(name, etag))
+        return hashlib.md5(u'|'.join(parts).encode('utf-8')).hexdigest()
 
     def post(self, request, *args, **kwargs):
-        self._setup_panels(request)
-        panel_name = request.GET.get(PANEL_IDENTIFIER, None)
-        if panel_name and panel_name in self.panels.keys():
+        panel = self.get_requested_panel(request)
+        if panel is not None:
             if not request.is_ajax():
                 return HttpResponseBadRequest()
-            return self.panels[panel_name].post(request, *args, **kwargs)
+            return panel.post(request, *args, **kwargs)
         return HttpResponseBadRequest("This View does not support POST")
 
     def __getitem__(self, item):
@@ -91,6 +1295,8 @@ class BasePanelView(six.with_metaclass(DeclarativeFieldsMetaclass, TemplateView)
           * {{ view.<item> }}
               will return rendered panel in template
               if item a available panel in view not a attribute of view.
+              Panels are looked up first unless a class attribute of the
+              view has the same name.
           * {% for name, panel in view.panels.items %}
               will still work as excepted
           * {{ view.<item>.title }}
@@ -100,6 +1306,11 @@ class BasePanelView(six.with_metaclass(DeclarativeFieldsMetaclass, TemplateView)
         flexible way.
         """
 
+        if item not in self._shadowed_panels:
+            try:
+                return self.panels[item]
+            except KeyError:
+                pass
         attribute = getattr(self, item, None)
         if attribute is not None:
             return attribute
@@ -116,6 +1327,81 @@ class BasePanelView(six.with_metaclass(DeclarativeFieldsMetaclass, TemplateView)
 class Panel(six.with_metaclass(DeclarativeFieldsMetaclass, ContextMixin)):
     title = 'title'
     template_name_suffix = u'{}_panel'
+    prerendered_content = None
+    timer = NULL_TIMER
+    # Created on first access, most panels never touch their context or
+    # url outside of rendering.
+    _context = None
+    _url = None
+    # How the panel is loaded on full-page renders: ``'inline'`` renders it
+    # with the page, ``'visible'`` and ``'idle'`` render a placeholder the
+    # browser loads via ``get_url()`` when it is scrolled into view or the
+    # browser is idle. ``lazy = True`` is short for ``'visible'``.
+    load_strategy = 'inline'
+    lazy = False
+    # Set on panels the browser loads itself, they are not set up.
+    deferred = False
+    # Names of the ``data_providers`` of the view the panel reads from
+    # ``self.data``.
+    requires_data = ()
+    # Result of ``get_context_data`` gathered by ``AsyncPanelView``.
+    prefetched_context_data = None
+    # Future of ``get_context_data`` started by ``AsyncPanelView``, waited
+    # for within the render deadline of the panel.
+    _context_future = None
+    # Seconds the rendered content is cached, ``None`` disables the cache.
+    # Do not cache panels rendering user specific data or csrf tokens
+    # without varying the cache key accordingly.
+    cache_timeout = None
+    cache_alias = 'default'
+    cache_vary_on_user = False
+    # Names of GET parameters the content depends on.
+    cache_vary_on_params = ()
+    # Let concurrent requests of the process rendering the same uncached
+    # content wait for one render. With ``cache_lock_timeout`` other
+    # processes wait as well, up to that many seconds, through a lock in
+    # the cache. Content expired less than ``stale_timeout`` seconds ago is
+    # served while the content is rendered again.
+    coalesce_renders = False
+    cache_lock_timeout = None
+    stale_timeout = None
+    # Seconds after which event streams send the panel again.
+    refresh_interval = None
+    # Context processors run for the panel, dotted paths or callables.
+    # ``None`` shares the output of the default processors evaluated once
+    # per request by the view.
+    context_processors = None
+    # Panels of concurrently rendered pages start in the order of their
+    # priority, highest first. Panels not rendered within ``render_timeout``
+    # seconds, or the ``panel_render_timeout`` of the view, show their
+    # ``fallback``: ``'empty'`` renders ``timeout_content()``, ``'lazy'`` a
+    # placeholder the browser loads via ``get_url()``.
+    priority = 0
+    render_timeout = None
+    fallback = 'empty'
+    # Optional ``CircuitBreaker`` skipping the panel while it keeps failing.
+    circuit_breaker = None
+    # Collapse the whitespace of the rendered content, before it is cached.
+    minify = False
+    # Compress panel responses of at least ``compress_min_length`` bytes for
+    # clients accepting gzip or brotli. The compressed bytes are cached, so
+    # repeated requests for unchanged content skip the compression.
+    precompress = False
+    compress_min_length = 200
+    # Keyset pagination: with ``paginate_by`` the panel renders that many
+    # rows of ``get_queryset()`` ordered by the unique ``cursor_field``
+    # (``'-field'`` for descending order) as ``object_list``. The next rows
+    # are requested from ``next_page_url`` and rendered with
+    # ``rows_template_name`` if set.
+    paginate_by = None
+    cursor_field = 'pk'
+    rows_template_name = None
+    _page = None
+    # Answer data requests (``?format=json``) with ``get_data()``. Panels
+    # not serving data answer ``?format=json`` with 406.
+    serve_data = False
+    # Content type of ``serialize_data()``.
+    data_content_type = 'application/json'
 
     @property
     def media(self):
@@ -123,45 +1409,570 @@ class Panel(six.with_metaclass(DeclarativeFieldsMetaclass, ContextMixin)):
 
     def __init__(self, view, name):
         self.name = name
-        if not hasattr(self, 'template_name'):
-            self.template_name_suffix =\
-                self.template_name_suffix.format(self.name)
         self.view = view
-        self.context = {'panel': self, 'view': self.view}
+
+    @property
+    def context(self):
+        """
+        Extra template context of the panel.
+        """
+        if self._context is None:
+            self._context = {'panel': self, 'view': self.view}
+        return self._context
+
+    @context.setter
+    def context(self, context):
+        self._context = context
 
     def set_up(self, request):
         self.request = request
 
+    @property
+    def data(self):
+        return self.view.data
+
     def get_url(self):
-        return u"{}?{}={}".format(
-            self.view.get_url(),
-            PANEL_IDENTIFIER,
-            self.name
-        )
+        if self._url is None:
+            self._url = u"{}?{}={}".format(
+                self.view.get_url(),
+                PANEL_IDENTIFIER,
+                self.name
+            )
+        return self._url
 
     def get_template_name(self, **kwargs):
         if hasattr(self, 'template_name'):
             return self.template_name
         view_template = self.view.get_template_names()[0]
-        return u'/'.join(view_template.split(u'/')[:-1]) \
-            + '/{}.html'.format(self.template_name_suffix)
+        suffix = self.template_name_suffix.format(self.name)
+        key = (view_template, suffix)
+        try:
+            return _template_names[key]
+        except KeyError:
+            pass
+        template_name = u'/'.join(view_template.split(u'/')[:-1]) \
+            + '/{}.html'.format(suffix)
+        _template_names[key] = template_name
+        return template_name
+
+    @classmethod
+    def cache_label(cls):
+        return u'{}.{}'.format(cls.__module__, cls.__name__)
+
+    @classmethod
+    def _generation_key(cls):
+        return u'{}.generation.{}'.format(CACHE_KEY_PREFIX, cls.cache_label())
+
+    @classmethod
+    def get_cache_generation(cls):
+        cache = caches[cls.cache_alias]
+        key = cls._generation_key()
+        generation = cache.get(key)
+        if generation is None:
+            # Start from the current time so a lost generation never
+            # resurrects content cached under an older one.
+            cache.add(key, int(time.time() * 1000), None)
+            generation = cache.get(key)
+        return generation
+
+    @classmethod
+    def invalidate_cache(cls):
+        """
+        Invalidate the cached content of all instances of this panel class.
+        """
+        cache = caches[cls.cache_alias]
+        key = cls._generation_key()
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+
+    @classmethod
+    def notify_changed(cls):
+        """
+        Send the panels of this class to open event streams again.
+
+        Invalidates the cached content first.
+        """
+        if cls.cache_timeout is not None:
+            cls.invalidate_cache()
+        panel_channel.publish(cls.cache_label())
+
+    def get_cache_key_parts(self):
+        """
+        Additional values the cached content depends on.
+        """
+        return []
+
+    def get_cache_key(self):
+        view_class = self.view.__class__
+        parts = [
+            view_class.__module__,
+            view_class.__name__,
+            self.name,
+            self.get_cache_generation(),
+            translation.get_language(),
+            # Views routed with url arguments show a panel per object.
+            self.request.path,
+        ]
+        if self.cache_vary_on_user:
+            user = getattr(self.request, 'user', None)
+            parts.append(getattr(user, 'pk', None))
+        params = self.cache_vary_on_params
+        if self.paginate_by:
+            params = tuple(params) + (CURSOR_IDENTIFIER, )
+        for param in params:
+            parts.append(u'{}={}'.format(
+                param, u','.join(self.request.GET.getlist(param))
+            ))
+        parts.extend(self.get_cache_key_parts())
+        digest = hashlib.md5(
+            u'|'.join(six.text_type(part) for part in parts).encode('utf-8')
+        ).hexdigest()
+        return u'{}.panel.{}'.format(CACHE_KEY_PREFIX, digest)
+
+    def delete_cached_content(self):
+        """
+        Remove the cached content for the current cache key only.
+        """
+        caches[self.cache_alias].delete(self.get_cache_key())
 
     def content(self, *args, **kwargs):
-        self.context.update(self.get_context_data(*args, **kwargs))
-        template_name = self.get_template_name(**kwargs)
-        return loader.get_template(template_name).render(
-            RequestContext(self.request, self.context)
-            # self.context
+        """
+        Rendered panel, evaluated once per request and reused afterwards.
+
+        Arguments are passed to ``get_context_data`` and bypass all caching.
+        """
+        if args or kwargs:
+            return self.render_content(*args, **kwargs)
+        if self.deferred:
+            return self.deferred_placeholder()
+        if self.prerendered_content is None:
+            self.prerendered_content = self._guarded_content()
+        return self.prerendered_content
+
+    def invalidate_content(self):
+        """
+        Forget the content and context data rendered during this request,
+        e.g. after a POST changed the data of the panel.
+        """
+        self.prerendered_content = None
+        self.prefetched_context_data = None
+        self._context_future = None
+        self._page = None
+
+    def _guarded_content(self, deadline=None):
+        """
+        Content guarded by the ``circuit_breaker``. Renders finishing after
+        ``deadline``, a timestamp, or their ``render_timeout`` do not close
+        the circuit.
+        """
+        breaker = self.circuit_breaker
+        if breaker is None:
+            return self._cached_content()
+        if not breaker.allow():
+            return self.fallback_content()
+        if self.render_timeout is not None:
+            timeout_at = time.time() + self.render_timeout
+            if deadline is None or timeout_at < deadline:
+                deadline = timeout_at
+        try:
+            content = self._cached_content()
+        except Exception:
+            logger.exception(u'Panel %s failed', self.cache_label())
+            breaker.failure()
+            return self.fallback_content()
+        if deadline is None or time.time() <= deadline:
+            # Concurrent renders missing their deadline were counted as
+            # failure by the page, a late finish must not reset the count.
+            breaker.success()
+        return content
+
+    def _cached_content(self):
+        if self.cache_timeout is None:
+            return self._minified_content()
+        cache = caches[self.cache_alias]
+        key = self.get_cache_key()
+        content = cache.get(key)
+        stale = None
+        if self.stale_timeout is not None and content is not None:
+            content, fresh_until = content
+            if fresh_until < time.time():
+                content, stale = None, content
+        if content is not None:
+            panel_cache_stats.hit(self.cache_label())
+            return content
+        panel_cache_stats.miss(self.cache_label())
+        if not self.coalesce_renders:
+            return self._render_into_cache(cache, key)
+        return single_flight(
+            key, lambda: self._render_once(cache, key, stale), stale,
+            self.cache_lock_timeout
+        )
+
+    def _render_into_cache(self, cache, key):
+        content = self._minified_content()
+        if self.stale_timeout is None:
+            cache.set(key, content, self.cache_timeout)
+        else:
+            cache.set(
+                key, (content, time.time() + self.cache_timeout),
+                self.cache_timeout + self.stale_timeout
+            )
+        return content
+
+    def _render_once(self, cache, key, stale=None):
+        """
+        Render into the cache unless another process holds the lock of
+        ``key``; then return ``stale`` or wait for its content.
+        """
+        if self.cache_lock_timeout is None:
+            return self._render_into_cache(cache, key)
+        lock_key = u'{}.lock'.format(key)
+        if cache.add(lock_key, 1, self.cache_lock_timeout):
+            try:
+                return self._render_into_cache(cache, key)
+            finally:
+                cache.delete(lock_key)
+        if stale is not None:
+            return stale
+        deadline = time.time() + self.cache_lock_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            content = cache.get(key)
+            if content is not None:
+                if self.stale_timeout is not None:
+                    content = content[0]
+                return content
+            if cache.get(lock_key) is None:
+                break
+        return self._render_into_cache(cache, key)
+
+    def _minified_content(self):
+        content = self.render_content()
+        if self.minify:
+            with self.timer.phase('minify'):
+                content = minify_html(content)
+        return content
+
+    def get_queryset(self):
+        """
+        Rows paginated with ``paginate_by``.
+        """
+        raise NotImplementedError(
+            'Panels with paginate_by must implement get_queryset()'
+        )
+
+    def get_cursor(self):
+        """
+        Value of ``cursor_field`` of the last row already sent, or ``None``.
+        """
+        cursor = self.request.GET.get(CURSOR_IDENTIFIER, None)
+        if not cursor:
+            return None
+        try:
+            return signing.loads(
+                cursor, salt=CURSOR_SALT, serializer=CursorSerializer
+            )
+        except signing.BadSignature:
+            raise SuspiciousOperation(u'Invalid panel cursor')
+
+    def get_page(self):
+        """
+        Return the rows after the cursor and the cursor of the next rows,
+        ``None`` on the last page. Evaluated once per request.
+        """
+        if self._page is not None:
+            return self._page
+        field = self.cursor_field.lstrip('-')
+        queryset = self.get_queryset().order_by(self.cursor_field)
+        cursor = self.get_cursor()
+        if cursor is not None:
+            lookup = 'lt' if self.cursor_field.startswith('-') else 'gt'
+            queryset = queryset.filter(
+                **{u'{}__{}'.format(field, lookup): cursor}
+            )
+        rows = list(queryset[:self.paginate_by + 1])
+        next_cursor = None
+        if len(rows) > self.paginate_by:
+            rows = rows[:self.paginate_by]
+            last = rows[-1]
+            value = last[field] if isinstance(last, dict) \
+                else getattr(last, field)
+            next_cursor = signing.dumps(
+                value, salt=CURSOR_SALT, serializer=CursorSerializer
+            )
+        self._page = (rows, next_cursor)
+        return self._page
+
+    def get_next_page_url(self):
+        next_cursor = self.get_page()[1]
+        if next_cursor is None:
+            return None
+        return u'{}&{}={}'.format(
+            self.get_url(), CURSOR_IDENTIFIER, next_cursor
+        )
+
+    def get_page_context(self):
+        rows, next_cursor = self.get_page()
+        return {
+            'object_list': rows,
+            'next_cursor': next_cursor,
+            'next_page_url': self.get_next_page_url(),
+        }
+
+    def is_next_page_request(self):
+        return bool(self.paginate_by
+                    and self.request.GET.get(CURSOR_IDENTIFIER))
+
+    def render_content(self, *args, **kwargs):
+        context = {'panel': self, 'view': self.view}
+        if self._context is not None:
+            context.update(self._context)
+        if self.paginate_by:
+            context.update(self.get_page_context())
+        if self._context_future is not None and not (args or kwargs):
+            future, self._context_future = self._context_future, None
+            self.prefetched_context_data = future.result()
+        if self.prefetched_context_data is not None and not (args or kwargs):
+            context.update(self.prefetched_context_data)
+        else:
+            with self.timer.phase('get_context_data'):
+                context.update(
+                    resolve(self.get_context_data(*args, **kwargs))
+                )
+        with self.timer.phase('render'):
+            template_name = self.get_template_name(**kwargs)
+            if self.rows_template_name and self.is_next_page_request():
+                template_name = self.rows_template_name
+            processor_context = self.get_processor_context()
+            processor_context.update(context)
+            return get_panel_template(template_name).render(
+                processor_context
+            )
+
+    def get_processor_context(self):
+        if self.context_processors is None:
+            return dict(self.view.get_processor_context(self.request))
+        return run_context_processors(
+            self.request, get_context_processors(self.context_processors)
+        )
+
+    def get_dom_id(self):
+        return u'panelviews-{}'.format(self.name)
+
+    def placeholder(self):
+        """
+        Html standing in for the panel until its content is streamed.
+        """
+        return format_html(
+            u'<div id="{}" class="panelviews-placeholder"></div>',
+            self.get_dom_id()
         )
 
+    def get_load_strategy(self):
+        if self.lazy and self.load_strategy == 'inline':
+            return 'visible'
+        if self.load_strategy not in LOAD_STRATEGIES:
+            raise ValueError(
+                u'load_strategy must be one of {} not {!r}'.format(
+                    u', '.join(LOAD_STRATEGIES), self.load_strategy
+                )
+            )
+        return self.load_strategy
+
+    def deferred_placeholder(self):
+        """
+        Html the browser replaces with the panel loaded from ``get_url()``.
+        """
+        return format_html(
+            u'<div id="{}" class="panelviews-placeholder panelviews-deferred" '
+            u'data-panel-url="{}" data-load-strategy="{}"></div>',
+            self.get_dom_id(), self.get_url(), self.get_load_strategy()
+        )
+
+    def streamed_content(self, content):
+        """
+        Html chunk moving ``content`` in place of the panels placeholder.
+        """
+        dom_id = self.get_dom_id()
+        content_id = u'{}-content'.format(dom_id)
+        return format_html(
+            u'<div id="{}" hidden>{}</div>', content_id, content
+        ) + format_html(STREAMED_PANEL_SCRIPT, dom_id, content_id)
+
+    def event(self, content):
+        """
+        Server-Sent Event replacing the panel in the browser.
+        """
+        data = json.dumps({'name': self.name, 'content': content})
+        return u'event: panel\ndata: {}\n\n'.format(data)
+
+    def fallback_content(self):
+        """
+        Content shown if the panel timed out, failed or its circuit is open.
+        """
+        if (self.fallback == 'lazy' and self.name not in
+                self.request.GET.getlist(PANEL_IDENTIFIER)):
+            return self.deferred_placeholder()
+        return self.timeout_content()
+
+    def timeout_content(self):
+        """
+        Content used if concurrent rendering of the panel timed out.
+        """
+        return u''
+
     def __unicode__(self):
         return self.content()
 
+    def get_etag(self):
+        """
+        Cheap identifier of the current panel content, e.g. a version
+        number. Checked before the context is built. ``None`` disables it.
+        """
+        return None
+
+    def get_version(self):
+        """
+        Cheap identifier of the current panel data, event streams send the
+        panel when it changes. Defaults to ``get_etag()``.
+        """
+        return self.get_etag()
+
+    def get_last_modified(self):
+        """
+        Datetime or timestamp of the last change of the panel content.
+        """
+        return None
+
+    def get_data(self):
+        """
+        Data of the panel for data requests, ``get_context_data()`` without
+        the panel itself. Override if the context holds objects like forms
+        or querysets.
+        """
+        if self.prefetched_context_data is not None:
+            data = dict(self.prefetched_context_data)
+        else:
+            with self.timer.phase('get_context_data'):
+                data = dict(resolve(self.get_context_data()))
+        data.pop('view', None)
+        if self.paginate_by:
+            data.update(self.get_page_context())
+        return data
+
+    def serialize_data(self, data):
+        """
+        Serialize ``get_data()``. Override to plug in a faster serializer.
+        """
+        return json.dumps(data, cls=DjangoJSONEncoder)
+
     def get(self, request, *args, **kwargs):
-        return HttpResponse(self.content())
+        etag = self.get_etag()
+        last_modified = self.get_last_modified()
+        data_format = request.GET.get(FORMAT_IDENTIFIER, None)
+        if not self.serve_data and data_format not in (None, 'html'):
+            return HttpResponse(status=406)
+        if is_not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        elif self.serve_data and wants_data(request):
+            data = self.get_data()
+            with self.timer.phase('serialize'):
+                content = self.serialize_data(data)
+            response = HttpResponse(
+                content, content_type=self.data_content_type
+            )
+        else:
+            response = HttpResponse(self.content())
+        if self.serve_data and data_format is None:
+            patch_vary_headers(response, ('Accept', ))
+        set_conditional_headers(response, etag, last_modified)
+        # Batched panels are sent within the JSON response of the view.
+        batched = len(request.GET.getlist(PANEL_IDENTIFIER)) > 1
+        if self.precompress and not batched:
+            self.compress_response(request, response)
+        return response
+
+    def compress_response(self, request, response):
+        """
+        Compress the content of ``response`` if the client accepts it.
+        """
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        content = response.content
+        encoding = accepted_encoding(request)
+        if (encoding is None or response.has_header('Content-Encoding')
+                or len(content) < self.compress_min_length):
+            return response
+        cache = caches[self.cache_alias]
+        key = u'{}.compressed.{}.{}'.format(
+            CACHE_KEY_PREFIX, encoding, hashlib.md5(content).hexdigest()
+        )
+        compressed = cache.get(key)
+        if compressed is None:
+            with self.timer.phase('compress'):
+                compressed = compress(content, encoding)
+            cache.set(
+                key, compressed,
+                self.cache_timeout or COMPRESSED_CACHE_TIMEOUT
+            )
+        if len(compressed) >= len(content):
+            return response
+        response.content = compressed
+        response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(compressed))
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(
+                r'"$', u';{}"'.format(encoding), response['ETag']
+            )
+        return response
 
     def post(self, request, *args, **kwargs):
         raise NotImplementedError('This function is not implemented now') # pragma: no cover
 
     def is_available(self, view, request):
         return True
+
+
+class AsyncPanelView(BasePanelView):
+    """
+    Panel view for I/O bound panels.
+
+    The panels are set up concurrently and their ``get_context_data`` is
+    started for all panels at once when the page is rendered. ``set_up``
+    and ``get_context_data`` may be coroutine functions (``async def``) on
+    Python 3; they are awaited together on one event loop while synchronous
+    panels run on threads. Panels wait for their context within their
+    render deadline and failures reach their ``circuit_breaker``, as on
+    other concurrently rendered pages.
+    """
+    render_panels_concurrently = True
+    load_data_concurrently = True
+
+    def set_up_panels(self, request, panels):
+        gather([
+            functools.partial(_set_up_panel, panel, request)
+            for panel in panels
+        ], self.max_render_workers)
+
+    def render_panels(self, panels=None):
+        if panels is None:
+            panels = self.panels.values()
+        panels = list(panels)
+        if asyncio is not None:
+            # Skip open circuits, they render their fallback anyway.
+            prefetched = [
+                panel for panel in panels
+                if not panel.deferred
+                and panel.prerendered_content is None
+                and panel.cache_timeout is None
+                and not (panel.circuit_breaker is not None
+                         and panel.circuit_breaker.is_open)
+            ]
+            futures = start_gather([
+                functools.partial(_get_context_data, panel)
+                for panel in prefetched
+            ], self.max_render_workers)
+            for panel, future in zip(prefetched, futures):
+                panel._context_future = future
+        super(AsyncPanelView, self).render_panels(panels)
@@ -0,0 +1,147 @@
+# coding: utf-8
+"""
+Warm the caches of the panel views reachable from the URLconf.
+
+Compiled templates and collected media are cached per process. Call
+``warm_panel_views()`` when a worker starts, e.g. in ``wsgi.py``. Rendered
+panels are cached in the cache backend, pre-render them once per deploy
+with ``manage.py warm_panels --render``.
+"""
+from collections import namedtuple
+from timeit import default_timer
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.urlresolvers import get_resolver
+from django.test import RequestFactory
+from django.utils import translation
+from django.utils.regex_helper import normalize
+
+from panelviews.views import BasePanelView, PanelCollection
+from panelviews.views import get_panel_template
+
+
+# A panel view found in the URLconf, ``path`` is ``None`` for url patterns
+# with arguments.
+FoundView = namedtuple('FoundView', ['path', 'view_class', 'initkwargs'])
+WarmupResult = namedtuple(
+    'WarmupResult', ['found_view', 'templates', 'rendered', 'timings']
+)
+
+
+def find_panel_views(urlconf=None):
+    """
+    Return the panel views of the URLconf, one per view class and path.
+    """
+    found = []
+    _collect_views(get_resolver(urlconf).url_patterns, u'', found)
+    return found
+
+
+def _collect_views(patterns, prefix, found):
+    for pattern in patterns:
+        regex = prefix + pattern.regex.pattern.lstrip(u'^')
+        if hasattr(pattern, 'url_patterns'):
+            _collect_views(pattern.url_patterns, regex, found)
+            continue
+        view_class = getattr(pattern.callback, 'view_class', None)
+        if not (isinstance(view_class, type)
+                and issubclass(view_class, BasePanelView)):
+            continue
+        path = None
+        urls = normalize(regex.rstrip(u'$'))
+        if len(urls) == 1 and not urls[0][1]:
+            path = u'/' + urls[0][0]
+        view = FoundView(
+            path, view_class, getattr(pattern.callback, 'view_initkwargs', {})
+        )
+        if view not in found:
+            found.append(view)
+
+
+def _init_view(found_view, request=None):
+    view = found_view.view_class(**found_view.initkwargs)
+    view.request = request
+    view.args = ()
+    view.kwargs = {}
+    return view
+
+
+def warm_templates(found_view):
+    """
+    Compile the templates of all panels of the view.
+
+    Returns the template names.
+    """
+    view = _init_view(found_view)
+    names = []
+    for name, panel_class in view.panel_specs:
+        panel = panel_class(view, name)
+        for template_name in (panel.get_template_name(),
+                              panel.rows_template_name):
+            if template_name and template_name not in names:
+                get_panel_template(template_name)
+                names.append(template_name)
+    return names
+
+
+def warm_media(found_view):
+    """
+    Collect the media of the view with all its panels.
+    """
+    view = _init_view(found_view)
+    panels = []
+    for name, panel_class in view.panel_specs:
+        panel = panel_class(view, name)
+        panel.deferred = panel.get_load_strategy() != 'inline'
+        panels.append((name, panel))
+    view.panels = PanelCollection(panels)
+    view.media.render()
+
+
+def warm_panels(found_view, user=None):
+    """
+    Render the panels of the view caching their content for ``user``.
+
+    Returns the names of the rendered panels.
+    """
+    request = RequestFactory().get(found_view.path)
+    request.user = user if user is not None else AnonymousUser()
+    view = _init_view(found_view, request)
+    view._setup_panels(request, defer=True)
+    rendered = []
+    for name, panel in view.panels.items():
+        if panel.cache_timeout is None or panel.deferred:
+            continue
+        panel.content()
+        rendered.append(name)
+    return rendered
+
+
+def warm_panel_views(urlconf=None, render=False, users=(None, )):
+    """
+    Warm templates and media, with ``render`` also the cacheable panels of
+    views without url arguments for every user of ``users``.
+
+    Returns a ``WarmupResult`` per view with the timings in milliseconds.
+    """
+    results = []
+    with translation.override(settings.LANGUAGE_CODE):
+        for found_view in find_panel_views(urlconf):
+            timings = {}
+            start = default_timer()
+            templates = warm_templates(found_view)
+            timings['templates'] = (default_timer() - start) * 1000
+            start = default_timer()
+            warm_media(found_view)
+            timings['media'] = (default_timer() - start) * 1000
+            rendered = []
+            if render and found_view.path is not None:
+                start = default_timer()
+                for user in users:
+                    rendered.extend(warm_panels(found_view, user))
+                timings['render'] = (default_timer() - start) * 1000
+            results.append(
+                WarmupResult(found_view, templates, rendered, timings)
+            )
+    return results